@@ -0,0 +1,183 @@
+"""
+访问日志后台写入
+
+请求线程只把记录放进有界队列（满了直接丢弃并计数），由后台线程批量写盘：
+    每攒够 batch 条或每 flush_interval 秒写一次
+    文件超过 max_bytes 或打开超过 rotate_seconds 时轮转为 <log>.<时间>.gz，保留 backups 个
+同时在内存里保留最近 recent 条记录，供 stats() 统计最近一段时间的访问情况。
+
+多进程 Web（gunicorn）各写各的文件：use_worker_slot() 用文件锁占一个编号，写 <log>.w<N>。
+进程退出时锁随之释放，重启的 worker 接着用空出来的编号和它的文件，文件组数不随重启增长。
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import Counter, deque
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，waitress 单进程也用不到编号
+    fcntl = None
+
+
+class AccessLogWriter:
+    def __init__(self, path, max_queue=10000, batch=500, flush_interval=1.0,
+                 max_bytes=10 * 1024 * 1024, rotate_seconds=86400, backups=14, recent=5000):
+        self.path = path
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._recent = deque(maxlen=recent)
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._opened_at = 0
+        self._slot_lock = None
+
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+    def use_worker_slot(self, max_slots=64):
+        """多个进程共用同一日志名时调用（在第一次写入前），返回占到的编号"""
+        if fcntl is None or self._slot_lock is not None:
+            return None
+        base = self.path
+        for n in range(max_slots):
+            f = open(f"{base}.w{n}.lock", "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                continue
+            self._slot_lock = f  # 保持打开，进程存活期间一直占着
+            self.path = f"{base}.w{n}"
+            return n
+        raise RuntimeError(f"{base} 的 {max_slots} 个访问日志编号都被占用")
+
+    # ---------- 请求线程 ----------
+
+    def write(self, record):
+        self._recent.append(record)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    # ---------- 后台线程 ----------
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._drain(block=True)
+        self._drain(block=False)
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _drain(self, block):
+        lines = []
+        deadline = time.time() + self.flush_interval
+        while len(lines) < self.batch:
+            timeout = deadline - time.time()
+            try:
+                if block and timeout > 0:
+                    record = self._queue.get(timeout=timeout)
+                else:
+                    record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+
+        if lines:
+            f = self._open()
+            f.write("".join(lines))
+            f.flush()
+            self.written += len(lines)
+            self._maybe_rotate()
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+            # 续写已有文件时从第一条记录的时间算起，避免频繁重启后永不按时间轮转
+            self._opened_at = self._first_timestamp() if self._file.tell() else time.time()
+        return self._file
+
+    def _first_timestamp(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.loads(f.readline()).get("timestamp") or time.time()
+        except (OSError, ValueError):
+            return time.time()
+
+    def _maybe_rotate(self):
+        f = self._file
+        if f.tell() < self.max_bytes and time.time() - self._opened_at < self.rotate_seconds:
+            return
+
+        f.close()
+        self._file = None
+        rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        n = 1
+        while os.path.exists(rotated + ".gz"):
+            rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}-{n}"
+            n += 1
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+        self.rotations += 1
+
+        # 只匹配本文件轮转出的 <log>.<时间>.gz，不碰其他 worker 的 <log>.w<N>.*
+        old = sorted(glob.glob(glob.escape(self.path) + ".[0-9]*.gz"))
+        for p in old[:max(0, len(old) - self.backups)]:
+            os.remove(p)
+
+    def close(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    # ---------- 统计 ----------
+
+    def stats(self, window=300, top=10):
+        """最近 window 秒内的访问统计（只看内存中的最近记录）"""
+        since = time.time() - window
+        recent = [r for r in list(self._recent) if r.get("timestamp", 0) >= since]
+
+        paths = Counter(r.get("path") for r in recent)
+        ips = Counter(r.get("ip") for r in recent)
+        status = Counter(str(r.get("status")) for r in recent)
+        ms = sorted(r["ms"] for r in recent if "ms" in r)
+
+        return {
+            "window": window,
+            "requests": len(recent),
+            "rps": round(len(recent) / window, 3) if window else 0,
+            "status": dict(status),
+            "top_paths": paths.most_common(top),
+            "top_ips": ips.most_common(top),
+            "p50_ms": ms[len(ms) // 2] if ms else None,
+            "p95_ms": ms[int(len(ms) * 0.95)] if ms else None,
+            "queue": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+        }
@@ -1,14 +1,19 @@
 import requests
 import json
-import openpyxl
 import time
 import re
 import os
 import datetime
 import logging
 import sys
+import threading
+from concurrent import futures
 from requests.utils import quote
 import weeklyReport
+import excelExport
+import httpClient
+import scheduler
+import recentKeys
 import time
 
 def load_config(path="config.json"):
@@ -18,17 +23,25 @@ def load_config(path="config.json"):
 CONFIG = load_config()
 
 # ================= 配置区域 =================
-TARGET_UIN = CONFIG["visitor"]["UIN"]  # 目标QQ
-UIN_NAME = CONFIG["visitor"]["nickname"]
-COOKIE_PATH = fr"./COOKIE/cookies-{TARGET_UIN}.json"
-DB_FILE = f"./qzone_visitor_db_{UIN_NAME}.json"
-EXCEL_FILE = f"./qzone_访客记录_总表_{UIN_NAME}.xlsx"
-INTERVAL = CONFIG["visitor"]["interval"]  # 刷新间隔(秒)
+# 账号列表见 config.json 的 accounts（缺省为 visitor 单账号），每个账号可单独设置 interval
+EXCEL_CONF = CONFIG.get("excel", {})
+COLLECTOR_CONF = CONFIG.get("collector", {})
+WORKERS = COLLECTOR_CONF.get("workers", 4)  # 同时采集的账号数上限
+BACKFILL_CONF = CONFIG.get("backfill", {})
+BACKFILL_FANOUT = BACKFILL_CONF.get("fanout", 4)  # 补抓时同时请求的页数，0 为关闭补抓
+BACKFILL_MAX_PAGES = BACKFILL_CONF.get("max_pages", 50)  # 单次补抓的最大页码
+LOG_HTTP_TIMING = CONFIG["visitor"].get("log_http_timing", False)
+COLLECTOR_ONLY = "--collector-only" in sys.argv or CONFIG["server"].get("mode", "single") == "split"
 UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36 Edg/135.0.0.0"
 # ===========================================
 
-# 启动 Web 服务（不阻塞）
-weeklyReport.run_background()
+# 采集端是数据的唯一写入者
+weeklyReport.open_accounts(readonly=False)
+
+# 单进程模式：同时启动 Web 服务（不阻塞）
+# 分进程模式（server.mode = "split" 或 --collector-only）：Web 由 wsgi.py 在其它进程提供
+if not COLLECTOR_ONLY:
+    weeklyReport.run_background()
 
 # ================= 日志配置 =================
 # 配置日志输出格式：时间 - 级别 - 消息
@@ -45,6 +58,17 @@ logging.basicConfig(
 logger = logging.getLogger("QzoneMonitor")
 # ===========================================
 
+# 本地 QQ 客户端只有一个，多个账号的 Cookie 刷新排队进行
+COOKIE_LOCK = threading.Lock()
+
+class CookieExpired(Exception):
+    """接口返回非 JSON 或错误码，需要刷新 Cookie"""
+
+class AccountLogger(logging.LoggerAdapter):
+    """日志前加上账号昵称"""
+    def process(self, msg, kwargs):
+        return f"[{self.extra['name']}] {msg}", kwargs
+
 def get_g_tk(skey):
     """计算 g_tk (bkn)"""
     hash_val = 5381
@@ -52,125 +76,6 @@ def get_g_tk(skey):
         hash_val = (hash_val << 5) + hash_val + ord(c)
     return hash_val & 2147483647
 
-def refresh_cookie():
-    """连接本地QQ客户端自动更新Cookie"""
-    logger.info("正在刷新 Cookie (依赖本地QQ)...")
-    s = requests.Session()
-    s.headers.update({'User-Agent': UA})
-    uin = TARGET_UIN
-
-    try:
-        # 1. 获取 pt_local_token
-        url1 = "https://xui.ptlogin2.qq.com/cgi-bin/xlogin?s_url=https%3A%2F%2Fhuifu.qq.com%2Findex.html&style=20&appid=715021417&proxy_url=https%3A%2F%2Fhuifu.qq.com%2Fproxy.html"
-        tk = s.get(url1, timeout=5).cookies.get('pt_local_token')
-        if not tk: raise Exception("无法获取 pt_local_token")
-
-        # 2. 获取 clientkey
-        url2 = f"https://localhost.ptlogin2.qq.com:4301/pt_get_st?clientuin={uin}&callback=ptui_getst_CB&r=0.7284667321181328&pt_local_tk={tk}"
-        try:
-            r2 = s.get(url2, headers={'Referer': 'https://ssl.xui.ptlogin2.qq.com/', 'Cookie': f'pt_local_token={tk}'}, timeout=5)
-        except: raise Exception("连接本地QQ失败，请检查QQ是否运行")
-        
-        if r2.status_code == 400: raise Exception("本地接口返回400")
-        
-        k_idx = re.search(r'keyindex:\s*(\d+)', r2.text)
-        ck = r2.cookies.get('clientkey')
-        if not k_idx or not ck: raise Exception("无法提取 keyindex 或 clientkey")
-
-        # 3. 获取跳转链接
-        u1 = quote(f"https://qzs.qzone.qq.com/qzone/v5/loginsucc.html?para=izone&specifyurl=http%3A%2F%2Fuser.qzone.qq.com%2F{uin}%2Finfocenter")
-        url3 = f"https://ssl.ptlogin2.qq.com/jump?clientuin={uin}&keyindex={k_idx.group(1)}&pt_aid=549000912&daid=5&u1={u1}&pt_local_tk={tk}&pt_3rd_aid=0&ptopt=1&style=40"
-        
-        r3 = s.get(url3, headers={'Cookie': f'pt_local_token={tk};clientuin={uin};clientkey={ck};'}, timeout=5)
-        # --- 正则修复 ---
-        # 兼容两种格式: 
-        # 1. ptui_qzone_login('0', '0', 'http...') 
-        # 2. ptui_qlogin_CB('0', 'http...', '')
-        pturl = re.search(r"'0',\s*(?:'0',\s*)?'(http.*?)'", r3.text)
-        if not pturl: raise Exception("无法解析跳转URL")
-
-        # 4. 获取最终Cookie
-        r4 = requests.get(pturl.group(1), headers={'User-Agent': UA}, allow_redirects=False, timeout=10)
-        cookies = r4.cookies.get_dict()
-        
-        if 'p_skey' not in cookies: raise Exception("最终Cookie缺失 p_skey")
-
-        cookies['g_tk'] = get_g_tk(cookies['p_skey'])
-        
-        os.makedirs(os.path.dirname(COOKIE_PATH), exist_ok=True)
-        with open(COOKIE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(cookies, f, indent=4, ensure_ascii=False)
-            
-        logger.info("Cookie 更新成功")
-        return True
-
-    except Exception as e:
-        logger.error(f"Cookie 更新失败: {e}")
-        return False
-
-def get_headers():
-    """读取本地配置"""
-    try:
-        with open(COOKIE_PATH, 'r', encoding='utf-8') as f:
-            d = json.load(f)
-        return {
-            'Cookie': ';'.join([f"{k}={v}" for k, v in d.items()]),
-            'User-Agent': UA
-        }, d.get('g_tk')
-    except: return None, None
-
-def append_to_json(new_records):
-    """只把新记录追加到 JSON 数组后面"""
-    if not new_records:
-        return
-
-    # 如果文件不存在，直接创建
-    if not os.path.exists(DB_FILE):
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(new_records, f, ensure_ascii=False, indent=4)
-        return
-
-    # JSON 不能真正 append，只能：读 -> 改 -> 写
-    with open(DB_FILE, 'r+', encoding='utf-8') as f:
-        try:
-            data = json.load(f)
-            if not isinstance(data, list):
-                data = []
-        except json.JSONDecodeError:
-            data = []
-
-        data.extend(new_records)
-
-        f.seek(0)
-        json.dump(data, f, ensure_ascii=False, indent=4)
-        f.truncate()
-
-
-def save_data(records):
-    """保存数据到 Excel 和 JSON"""
-    # Excel
-    try:
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "访客记录"
-        ws.append(["时间戳(time)", "访问时间", "QQ号(uin)", "昵称(name)", "src", "platform_src", "service_src", "hide_from", "is_hide_visit", "yellow", "supervip", "shuoshuo_id"])
-        
-        for r in records:
-            ws.append([
-                r['time'], r['time_str'], r['uin'], r['name'], r['src'], r['platform_src'], 
-                r['service_src'], r['hide_from'], r['is_hide_visit'], r['yellow'], r['supervip'], r['shuoshuo_id']
-            ])
-            
-        dims = {'A': 13, 'B': 20, 'C': 20, 'D': 15, 'L': 30}
-        for c, w in dims.items(): ws.column_dimensions[c].width = w
-        wb.save(EXCEL_FILE)
-    except PermissionError: 
-        logger.warning("Excel 被占用，本次未写入，仅更新JSON")
-
-    # JSON
-    with open(DB_FILE, 'w', encoding='utf-8') as f:
-        json.dump(records, f, ensure_ascii=False, indent=4)
-
 def parse_visitor(item):
     """格式化单条数据"""
     ssid = item['shuoshuoes'][0]['id'] if item.get('shuoshuoes') else ""
@@ -183,87 +88,359 @@ def parse_visitor(item):
         "supervip": item.get('supervip'), "shuoshuo_id": ssid
     }
 
-def run_task(retry=False):
-    """执行监控任务"""
-    headers, tk = get_headers()
-    if not headers:
-        if refresh_cookie(): return run_task(True)
-        return
+class Account:
+    """单个被监控账号：Cookie、HTTP 会话、存储、Excel 导出和退避状态"""
+
+    def __init__(self, conf):
+        self.key = conf["key"]
+        self.uin = conf["UIN"]
+        self.nickname = conf["nickname"]
+        self.interval = conf["interval"]  # 初始刷新间隔(秒)，之后由调度器调整
+        self.api_base = conf.get("api_base", "https://h5.qzone.qq.com")  # 可指向本地替身服务做测试
+        self.cookie_path = conf.get("cookie_file") or fr"./COOKIE/cookies-{self.uin}.json"
+        self.excel_file = conf.get("excel_file") or f"./qzone_访客记录_总表_{self.nickname}.xlsx"
+        self.log = AccountLogger(logger, {"name": self.nickname})
+
+        # 长连接 HTTP 客户端（连接池复用 TCP/TLS）
+        self.http = httpClient.make_session(UA, pool_size=max(4, BACKFILL_FANOUT))
+
+        # 内存中的 Cookie，只在 refresh_cookie 写入新文件后更新
+        self.cookie = {"headers": None, "g_tk": None}
+
+        # 存储后端与 Web 端共用
+        self.data = weeklyReport.get_data(self.key)
+        self.store = self.data.store
+
+        # 去重状态：只从存储末尾一个窗口重建
+        self.recent = recentKeys.RecentKeys(
+            window=COLLECTOR_CONF.get("dedupe_window", 3600),
+            max_keys=COLLECTOR_CONF.get("dedupe_max_keys", 20000),
+        )
+        self.recent.rebuild(self.store)
+
+        # 后台 Excel 导出（不阻塞采集循环）
+        self.exporter = excelExport.ExcelExporter(
+            self.excel_file,
+            self.store.iter_records,
+            every_records=EXCEL_CONF.get("every_records", 50),
+            every_seconds=EXCEL_CONF.get("every_seconds", 60),
+            per_month=EXCEL_CONF.get("per_month", False),
+            observe=lambda seconds: self.observe_stage("excel", seconds),
+        )
+        self.exporter.start()
+        weeklyReport.register_export_trigger(self.key, self.exporter.request_export)
+
+        # 调度状态
+        self.catch_up = BACKFILL_CONF.get("on_startup", True)
+        self.scheduler = scheduler.AdaptiveScheduler(
+            self.interval,
+            min_interval=conf.get("min_interval", COLLECTOR_CONF.get("min_interval", 2)),
+            max_interval=conf.get("max_interval", COLLECTOR_CONF.get("max_interval", 60)),
+            target_new=COLLECTOR_CONF.get("target_new", 10),
+            max_backoff=COLLECTOR_CONF.get("max_backoff", 300),
+            jitter=COLLECTOR_CONF.get("jitter", 0.1),
+        )
+        self.last_fetched = 0
+        self.last_error = None
+        self.next_run = 0.0
+        weeklyReport.register_collector_status(self.key, self.status)
+
+    # ---------- Cookie ----------
+
+    def refresh_cookie(self):
+        with COOKIE_LOCK:
+            return self._refresh_cookie()
+
+    def _refresh_cookie(self):
+        """连接本地QQ客户端自动更新Cookie"""
+        self.log.info("正在刷新 Cookie (依赖本地QQ)...")
+        s = requests.Session()
+        s.headers.update({'User-Agent': UA})
+        uin = self.uin
 
-    url = f"https://h5.qzone.qq.com/proxy/domain/g.qzone.qq.com/cgi-bin/friendshow/cgi_get_visitor_more?uin={TARGET_UIN}&mask=7&page=1&fupdate=1&g_tk={tk}"
-    
-    try:
-        res = requests.get(url, headers=headers, timeout=10).text.strip()
-    except Exception as e:
-        logger.error(f"请求超时/错误: {e}")
-        return
-
-    # 检查状态
-    match = re.search(r'_Callback\((.*)\);?', res, re.DOTALL)
-    if not match:
-        logger.warning("API 返回非 JSON 格式 -> 尝试刷新 Cookie")
-        if not retry and refresh_cookie(): run_task(True)
-        return
+        try:
+            # 1. 获取 pt_local_token
+            url1 = "https://xui.ptlogin2.qq.com/cgi-bin/xlogin?s_url=https%3A%2F%2Fhuifu.qq.com%2Findex.html&style=20&appid=715021417&proxy_url=https%3A%2F%2Fhuifu.qq.com%2Fproxy.html"
+            tk = s.get(url1, timeout=5).cookies.get('pt_local_token')
+            if not tk: raise Exception("无法获取 pt_local_token")
+
+            # 2. 获取 clientkey
+            url2 = f"https://localhost.ptlogin2.qq.com:4301/pt_get_st?clientuin={uin}&callback=ptui_getst_CB&r=0.7284667321181328&pt_local_tk={tk}"
+            try:
+                r2 = s.get(url2, headers={'Referer': 'https://ssl.xui.ptlogin2.qq.com/', 'Cookie': f'pt_local_token={tk}'}, timeout=5)
+            except: raise Exception("连接本地QQ失败，请检查QQ是否运行")
+            
+            if r2.status_code == 400: raise Exception("本地接口返回400")
+            
+            k_idx = re.search(r'keyindex:\s*(\d+)', r2.text)
+            ck = r2.cookies.get('clientkey')
+            if not k_idx or not ck: raise Exception("无法提取 keyindex 或 clientkey")
 
-    try:
-        data = json.loads(match.group(1))
-        if data.get('code') != 0:
-            logger.warning(f"API 错误 (code={data.get('code')}) -> 尝试刷新 Cookie")
-            if not retry and refresh_cookie(): run_task(True)
-            return
-    except: return
+            # 3. 获取跳转链接
+            u1 = quote(f"https://qzs.qzone.qq.com/qzone/v5/loginsucc.html?para=izone&specifyurl=http%3A%2F%2Fuser.qzone.qq.com%2F{uin}%2Finfocenter")
+            url3 = f"https://ssl.ptlogin2.qq.com/jump?clientuin={uin}&keyindex={k_idx.group(1)}&pt_aid=549000912&daid=5&u1={u1}&pt_local_tk={tk}&pt_3rd_aid=0&ptopt=1&style=40"
+            
+            r3 = s.get(url3, headers={'Cookie': f'pt_local_token={tk};clientuin={uin};clientkey={ck};'}, timeout=5)
+            # --- 正则修复 ---
+            # 兼容两种格式: 
+            # 1. ptui_qzone_login('0', '0', 'http...') 
+            # 2. ptui_qlogin_CB('0', 'http...', '')
+            pturl = re.search(r"'0',\s*(?:'0',\s*)?'(http.*?)'", r3.text)
+            if not pturl: raise Exception("无法解析跳转URL")
+
+            # 4. 获取最终Cookie
+            r4 = requests.get(pturl.group(1), headers={'User-Agent': UA}, allow_redirects=False, timeout=10)
+            cookies = r4.cookies.get_dict()
+            
+            if 'p_skey' not in cookies: raise Exception("最终Cookie缺失 p_skey")
 
-    # 处理数据
-    new_items = []
-    for item in data.get('data', {}).get('items', []):
-        new_items.append(parse_visitor(item))
-        for sub in item.get('uins', []): new_items.append(parse_visitor(sub))
+            cookies['g_tk'] = get_g_tk(cookies['p_skey'])
+            
+            os.makedirs(os.path.dirname(self.cookie_path), exist_ok=True)
+            with open(self.cookie_path, 'w', encoding='utf-8') as f:
+                json.dump(cookies, f, indent=4, ensure_ascii=False)
+            self.set_cookie_cache(cookies)
+                
+            self.log.info("Cookie 更新成功")
+            return True
 
-    # 合并去重
-    local = []
-    if os.path.exists(DB_FILE):
-        try:
-            with open(DB_FILE, 'r', encoding='utf-8') as f: local = json.load(f)
-        except: pass
+        except Exception as e:
+            self.log.error(f"Cookie 更新失败: {e}")
+            return False
 
-    exist_keys = {(r['uin'], r['time']) for r in local}
-    added = 0
-    added_records = []
+    def set_cookie_cache(self, d):
+        self.cookie["headers"] = {
+            'Cookie': ';'.join([f"{k}={v}" for k, v in d.items()]),
+            'User-Agent': UA
+        }
+        self.cookie["g_tk"] = d.get('g_tk')
 
-    for r in new_items:
-        key = (r['uin'], r['time'])
-        if key not in exist_keys:
-            local.append(r)
-            added_records.append(r)
-            exist_keys.add(key)
-            added += 1
+    def get_headers(self):
+        """读取 Cookie（首次从文件加载，之后使用内存副本）"""
+        if self.cookie["headers"] is None:
+            try:
+                with open(self.cookie_path, 'r', encoding='utf-8') as f:
+                    self.set_cookie_cache(json.load(f))
+            except: return None, None
+        return self.cookie["headers"], self.cookie["g_tk"]
 
+    # ---------- 指标 ----------
 
-    if added > 0:
-        logger.info(f"发现 {added} 条新记录，已追加保存。")
+    def stage(self, name):
+        return weeklyReport.METRICS.time("qzone_collector_stage_seconds", account=self.key, stage=name)
 
-    # 1. 追加 JSON
-    append_to_json(added_records)
+    def observe_stage(self, name, seconds):
+        weeklyReport.METRICS.observe("qzone_collector_stage_seconds", seconds, account=self.key, stage=name)
 
-    # 2. Excel 仍然用全量（否则很难保证顺序 & 去重）
-    local.sort(key=lambda x: x.get('time') or 0, reverse=True)
-    save_data(local)
+    # ---------- 采集 ----------
 
+    def append_records(self, new_records):
+        """只把新记录批量写入存储后端（同时对 Web 端可见）"""
+        if not new_records:
+            return
+        self.store.append(new_records)
+
+    def fetch_page(self, page, headers, tk):
+        """抓取一页访客并解析；Cookie 失效抛 CookieExpired，网络错误原样抛出"""
+        url = f"{self.api_base}/proxy/domain/g.qzone.qq.com/cgi-bin/friendshow/cgi_get_visitor_more?uin={self.uin}&mask=7&page={page}&fupdate=1&g_tk={tk}"
+
+        with self.stage("fetch"):
+            resp, timing = httpClient.timed_get(self.http, url, headers=headers, timeout=10)
+            res = resp.text.strip()
+
+        if LOG_HTTP_TIMING:
+            self.log.info(f"HTTP page={page} {httpClient.format_timings(timing)}")
+
+        with self.stage("parse"):
+            # 检查状态
+            match = re.search(r'_Callback\((.*)\);?', res, re.DOTALL)
+            if not match:
+                raise CookieExpired("API 返回非 JSON 格式")
+
+            data = json.loads(match.group(1))
+            if data.get('code') != 0:
+                raise CookieExpired(f"API 错误 (code={data.get('code')})")
+
+            # 处理数据
+            new_items = []
+            for item in data.get('data', {}).get('items', []):
+                new_items.append(parse_visitor(item))
+                for sub in item.get('uins', []): new_items.append(parse_visitor(sub))
+        return new_items
+
+    def merge(self, new_items):
+        """去重后追加到存储并通知导出，返回新增的记录"""
+        # 高水位 + 最近键窗口，成本只与本页条数有关
+        with self.stage("dedupe"):
+            added_records = self.recent.filter(new_items)
+
+        # 1. 追加到存储（只写新记录；含日志写盘和各索引更新）
+        with self.stage("append"):
+            self.append_records(added_records)
+        self.recent.add(added_records)
+
+        # 2. 通知后台导出 Excel（无新记录时不导出）
+        self.exporter.notify(added_records)
+        return added_records
+
+    def backfill(self, start_page, headers, tk):
+        """
+        从 start_page 起每批并发抓取 BACKFILL_FANOUT 页，按页序合并，
+        遇到整页都已存在（或空页）即停止；返回 [(页码, 抓到条数, 新增条数)]
+        """
+        pages = []
+        page = start_page
+        with futures.ThreadPoolExecutor(max_workers=BACKFILL_FANOUT) as pool:
+            while page <= BACKFILL_MAX_PAGES:
+                batch = list(range(page, min(page + BACKFILL_FANOUT, BACKFILL_MAX_PAGES + 1)))
+                jobs = [pool.submit(self.fetch_page, p, headers, tk) for p in batch]
+                for p, job in zip(batch, jobs):
+                    try:
+                        items = job.result()
+                    except Exception as e:
+                        self.log.warning(f"补抓第 {p} 页失败: {e}")
+                        return pages
+                    added = self.merge(items)
+                    pages.append((p, len(items), len(added)))
+                    if not added:
+                        return pages
+                page = batch[-1] + 1
+
+        self.log.warning(f"补抓达到页数上限 {BACKFILL_MAX_PAGES}，更早的记录未补齐")
+        return pages
+
+    @staticmethod
+    def reached_new(items, added_records):
+        """整页最旧的一条是否为新记录（还没接上已存储的部分）"""
+        oldest = min(items, key=lambda r: r['time'] or 0)
+        return any(r is oldest for r in added_records)
+
+    def run_task(self, retry=False, catch_up=False):
+        """
+        执行监控任务，返回新增条数；失败返回 None，原因记在 last_error
+        第 1 页最旧的一条也是新记录，说明两次轮询之间的访问可能超过一页，继续补抓后续页；
+        catch_up=True（启动时）只要第 1 页有新记录就补抓，追回停机期间的访问
+        """
+        headers, tk = self.get_headers()
+        if not headers:
+            self.last_error = "cookie"
+            if not retry and self.refresh_cookie(): return self.run_task(True, catch_up)
+            return
 
-def main():
-    logger.info(f"监控启动 | QQ: {TARGET_UIN} | 频率: {INTERVAL}s")
-    if not os.path.exists(COOKIE_PATH): refresh_cookie()
-    
-    while True:
         try:
-            run_task()
-            time.sleep(INTERVAL)
-        except KeyboardInterrupt:
-            logger.info("停止运行")
-            break
+            items = self.fetch_page(1, headers, tk)
+        except CookieExpired as e:
+            self.log.warning(f"{e} -> 尝试刷新 Cookie")
+            self.last_error = "api"
+            if not retry and self.refresh_cookie(): return self.run_task(True, catch_up)
+            return
+        except Exception as e:
+            self.log.error(f"请求超时/错误: {e}")
+            self.last_error = "network"
+            return
+
+        # 第 1 页推高的高水位不能让补抓页落到去重窗口之外
+        with self.recent.hold():
+            added_records = self.merge(items)
+            added = len(added_records)
+            self.last_fetched = len(items)
+
+            if BACKFILL_FANOUT > 0 and added and (catch_up or self.reached_new(items, added_records)):
+                t0 = time.time()
+                pages = [(1, len(items), added)] + self.backfill(2, headers, tk)
+                added = sum(n for _, _, n in pages)
+                self.last_fetched = sum(n for _, n, _ in pages)
+                self.log.info(
+                    f"补抓 {len(pages)} 页，共 {added} 条，耗时 {time.time() - t0:.2f}s | "
+                    + " ".join(f"p{p}+{n}" for p, _, n in pages)
+                )
+
+        if added > 0:
+            self.log.info(f"发现 {added} 条新记录，已追加保存。")
+
+        return added
+
+    def poll(self):
+        """调度入口：采集一次，由调度器决定下一次的等待时间"""
+        self.last_error = None
+        try:
+            with self.stage("run_task"):
+                added = self.run_task(catch_up=self.catch_up)
         except Exception as e:
-            logger.critical(f"未知错误: {e}", exc_info=True)
-            time.sleep(INTERVAL)
+            self.log.critical(f"未知错误: {e}", exc_info=True)
+            added = None
+            self.last_error = "error"
+
+        weeklyReport.METRICS.inc(
+            "qzone_collector_polls_total", account=self.key, result=self.last_error or "ok"
+        )
+        if added:
+            weeklyReport.METRICS.inc("qzone_collector_records_added_total", added, account=self.key)
+
+        if added is not None:
+            self.catch_up = False
+            delay = self.scheduler.on_success(added, self.last_fetched)
+        else:
+            delay = self.scheduler.on_failure(self.last_error or "error")
+            self.log.warning(f"连续失败 {self.scheduler.failures} 次，{delay:.1f}s 后重试")
+        self.next_run = time.time() + delay
+
+        # 分进程部署时通过文件与 Web 端交流
+        if self.data.take_export_request():
+            self.exporter.request_export()
+        try:
+            status = self.status()
+            # Web 端的 /admin/api/metrics 从这里取采集端的指标
+            status["metrics"] = weeklyReport.METRICS.snapshot(account=self.key)
+            self.data.write_status(status)
+        except OSError as e:
+            self.log.warning(f"写入调度状态失败: {e}")
+
+    def status(self):
+        """供管理后台查看的调度状态"""
+        state = self.scheduler.snapshot()
+        state.update({
+            "nickname": self.nickname,
+            "next_run": int(self.next_run),
+            "last_error": self.last_error,
+            "dedupe": self.recent.stats(),
+            "updated": int(time.time()),
+        })
+        return state
+
+
+ACCOUNTS = [Account(conf) for conf in weeklyReport.ACCOUNT_CONFS]
+
+def main():
+    for acc in ACCOUNTS:
+        acc.log.info(f"监控启动 | QQ: {acc.uin} | 频率: {acc.interval}s")
+        if not os.path.exists(acc.cookie_path): acc.refresh_cookie()
+
+    pool = futures.ThreadPoolExecutor(max_workers=max(1, min(WORKERS, len(ACCOUNTS))))
+    running = {}  # key -> Future
+
+    try:
+        while True:
+            now = time.time()
+            for acc in ACCOUNTS:
+                if acc.key not in running and acc.next_run <= now:
+                    running[acc.key] = pool.submit(acc.poll)
+
+            for key in [k for k, f in running.items() if f.done()]:
+                running.pop(key)
+
+            # 等到最近一个账号到期，或任意一次采集结束
+            idle = [acc.next_run for acc in ACCOUNTS if acc.key not in running]
+            timeout = max(0.0, min(idle) - time.time()) if idle else None
+            if running:
+                futures.wait(list(running.values()), timeout=timeout, return_when=futures.FIRST_COMPLETED)
+            else:
+                time.sleep(timeout)
+    except KeyboardInterrupt:
+        logger.info("停止运行")
+        pool.shutdown(wait=False, cancel_futures=True)
+        for acc in ACCOUNTS:
+            acc.exporter.flush()
 
 if __name__ == "__main__":
     main()
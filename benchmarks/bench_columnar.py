@@ -0,0 +1,134 @@
+"""
+列式 NumPy 引擎 vs 纯 Python 存储
+
+    python benchmarks/bench_columnar.py
+    python benchmarks/bench_columnar.py --sizes 100000 1000000
+
+对同一份合成数据分别计算一周的汇总、15 分钟 / 1 小时分桶序列和说说序列，
+先校验两边输出完全一致，再比较耗时。
+
+    python benchmarks/bench_columnar.py --check
+
+只跑边界情况的一致性检查（uin 为 None / 缺失 / 数字字符串与整数同号 / 非数字字符串等）。
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import columnar
+import visitorStore
+
+DAY = 86400
+WEEK = 7 * DAY
+START = 1700000000 - 1700000000 % 3600
+
+
+def make_records(n, days=365, seed=42):
+    rnd = random.Random(seed)
+    span = days * DAY
+    sids = [f"ss{i:05d}" for i in range(2000)]
+    return [
+        {
+            "time": START + rnd.randrange(span),
+            "uin": int(rnd.paretovariate(1.2) * 10000),
+            "shuoshuo_id": rnd.choice(sids) if rnd.random() < 0.6 else "",
+        }
+        for _ in range(n)
+    ]
+
+
+def check_parity():
+    """两种引擎在边界输入上逐项一致"""
+    t = START + 100 * DAY
+    records = [
+        {"time": t, "uin": 123, "shuoshuo_id": "a"},
+        {"time": t + 1, "uin": "123", "shuoshuo_id": "a"},   # 与 123 是不同访客
+        {"time": t + 2, "uin": None, "shuoshuo_id": ""},     # uin 为 None 也计为一个访客
+        {"time": t + 3, "uin": None},
+        {"time": t + 4, "shuoshuo_id": "b"},                 # 没有 uin 字段，不计
+        {"time": t + 5, "uin": "abc"},
+        {"time": t + 6, "uin": "abc"},
+        {"time": t + 7, "uin": -5},
+        {"time": t + 8, "uin": 0},
+        {"time": t + 9, "uin": 2 ** 70},
+        {"time": 0, "uin": 7},                               # 无时间，不进分桶
+        {"time": t + 3600, "uin": 123, "shuoshuo_id": "b"},
+    ]
+    for compact in (True, False):
+        py = visitorStore.VisitorStore.from_records(records, compact=compact)
+        npi = columnar.build(records)
+        cases = {
+            "range_counts(day)": lambda e: e.range_counts(t, t + DAY),
+            "range_counts(all)": lambda e: e.range_counts(0, t + DAY),
+            "bucket_counts": lambda e: e.bucket_counts(t, 600, 12),
+            "shuoshuo_bucket_counts": lambda e: dict(e.shuoshuo_bucket_counts(t, 600, 12)),
+        }
+        for name, fn in cases.items():
+            r_py, r_np = fn(py), fn(npi)
+            if r_py != r_np:
+                raise AssertionError(f"{name} 输出不一致 (compact={compact}): {r_py} != {r_np}")
+    print("✅ 边界情况一致")
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def run(n):
+    records = make_records(n)
+    week_start = START + 200 * DAY
+
+    t0 = time.perf_counter()
+    py = visitorStore.VisitorStore.from_records(records)
+    py_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    npi = columnar.build(records)
+    len(npi)
+    np_build = time.perf_counter() - t0
+
+    cases = {
+        "range_counts(week)": lambda e: e.range_counts(week_start, week_start + WEEK),
+        "bucket_counts(week, 900s)": lambda e: e.bucket_counts(week_start, 900, WEEK // 900),
+        "bucket_counts(year, 3600s)": lambda e: e.bucket_counts(START, 3600, 365 * 24),
+        "shuoshuo_bucket_counts(week)": lambda e: dict(e.shuoshuo_bucket_counts(week_start, 3600, 168)),
+    }
+
+    print(f"\n== {n:,} 条记录 ==")
+    print(f"{'build':32s} python {py_build * 1000:10.1f} ms   numpy {np_build * 1000:10.1f} ms")
+    for name, fn in cases.items():
+        t_py, r_py = timed(lambda: fn(py))
+        t_np, r_np = timed(lambda: fn(npi))
+        if r_py != r_np:
+            raise AssertionError(f"{name} 输出不一致")
+        print(
+            f"{name:32s} python {t_py * 1000:10.2f} ms   numpy {t_np * 1000:10.2f} ms"
+            f"   x{t_py / t_np if t_np else float('inf'):.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--check", action="store_true", help="只跑边界情况的一致性检查")
+    args = parser.parse_args()
+    check_parity()
+    if args.check:
+        return
+    for n in args.sizes:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+条件请求 + 压缩：反复刷新看板时的传输字节数和服务端耗时
+
+    python benchmarks/bench_conditional.py --records 200000 --refreshes 200 --change-every 20
+
+在临时目录生成合成数据和 config.json 后导入 weeklyReport，用 Flask 测试客户端模拟
+浏览器反复刷新首页数据（/api/report、本周 15 分钟序列、近 30 天 15 分钟序列、管理员 Top10）。
+每 change_every 次刷新追加一批新记录（模拟采集端写入），对比三种客户端：
+    plain        不带 Accept-Encoding，也不带 If-None-Match（原来的行为）
+    gzip         只协商压缩
+    gzip+etag    压缩并携带上次的 ETag（浏览器的默认行为）
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import visitorLog
+
+DAY = 86400
+
+
+def make_records(n, end, days=60, seed=42):
+    rnd = random.Random(seed)
+    records = []
+    for _ in range(n):
+        t = end - rnd.randrange(days * DAY)
+        records.append(make_record(rnd, t))
+    records.sort(key=lambda r: r["time"])
+    return records
+
+
+def make_record(rnd, t):
+    return {
+        "time": t,
+        "time_str": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)),
+        "uin": int(rnd.paretovariate(1.2) * 10000),
+        "name": f"user{rnd.randrange(100000)}",
+        "shuoshuo_id": f"ss{rnd.randrange(500):04d}" if rnd.random() < 0.6 else "",
+    }
+
+
+def setup(workdir, n):
+    # 仓库里的 config.json 打了码，这里写一份最小配置
+    config = {
+        # 绝对路径：退出时 atexit 保存索引，那时已切回原工作目录
+        "db_file": os.path.join(workdir, "bench_db.json"),
+        "log_file": os.path.join(workdir, "access.log"),
+        "storage": {"backend": "memory", "engine": "python"},
+        "qos": {"limit": 10 ** 9, "window": 1},
+        "cache": {"capacity": 256, "ttl": 15, "persist": False},
+        "server": {"host": "127.0.0.1", "port": 0, "refresh_interval": 15},
+        "admin": {"token": "bench", "ips": [], "secret_key": "bench"},
+        "visitor": {"UIN": 10000, "nickname": "bench", "interval": 5},
+    }
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False)
+
+    log = visitorLog.open_log(os.path.join(workdir, "bench_db"))
+    log.append(make_records(n, int(time.time())))
+
+
+def run(name, client, paths, refreshes, change_every, data, gzip, etag):
+    rnd = random.Random(7)
+    headers = {"Accept-Encoding": "gzip"} if gzip else {}
+    etags = {}
+    wire = 0
+    server = 0.0
+    not_modified = 0
+
+    for i in range(refreshes):
+        if change_every and i and i % change_every == 0:
+            now = int(time.time())
+            data.store.append([make_record(rnd, now - rnd.randrange(60)) for _ in range(5)])
+
+        for path in paths:
+            h = dict(headers)
+            if etag and path in etags:
+                h["If-None-Match"] = etags[path]
+            t0 = time.perf_counter()
+            resp = client.get(path, headers=h)
+            server += time.perf_counter() - t0
+            body = resp.get_data()
+            wire += len(body) + sum(len(k) + len(v) + 4 for k, v in resp.headers.items())
+            if resp.status_code == 304:
+                not_modified += 1
+            elif resp.status_code != 200:
+                raise AssertionError(f"{path} -> {resp.status_code}")
+            if resp.headers.get("ETag"):
+                etags[path] = resp.headers["ETag"]
+
+    total = refreshes * len(paths)
+    print(
+        f"{name:10s} 传输 {wire / 1024:10.1f} KB   每请求 {wire / total / 1024:7.2f} KB   "
+        f"服务端 {server * 1000 / total:7.2f} ms/请求   304 {not_modified}/{total}"
+    )
+    return wire, server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--change-every", type=int, default=20, help="每多少次刷新追加一批新记录，0 为不变")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_conditional_")
+    cwd = os.getcwd()
+    try:
+        setup(workdir, args.records)
+        os.chdir(workdir)
+        import weeklyReport
+
+        data = weeklyReport.open_accounts(readonly=False)[weeklyReport.DEFAULT_ACCOUNT]
+        week_start, week_end = weeklyReport.week_range(0)
+        now = int(time.time())
+        paths = [
+            "/api/report",
+            f"/api/report/custom?start={week_start}&end={week_end}&scale=900",
+            f"/api/report/custom?start={now - now % 900 - 30 * DAY}&end={now - now % 900}&scale=900",
+            "/admin/api/top10",
+        ]
+
+        client = weeklyReport.app.test_client()
+        with client.session_transaction() as s:
+            s["is_admin"] = True
+
+        print(
+            f"{len(data.store):,} 条记录，{args.refreshes} 次刷新 × {len(paths)} 个接口，"
+            f"每 {args.change_every} 次刷新有新数据"
+        )
+        base, base_t = run("plain", client, paths, args.refreshes, args.change_every, data, False, False)
+        run("gzip", client, paths, args.refreshes, args.change_every, data, True, False)
+        wire, t = run("gzip+etag", client, paths, args.refreshes, args.change_every, data, True, True)
+        print(f"gzip+etag 相比 plain：字节 -{(1 - wire / base) * 100:.1f}%   服务端耗时 -{(1 - t / base_t) * 100:.1f}%")
+
+        weeklyReport.ACCESS_LOG.close()
+        data.save_indexes()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
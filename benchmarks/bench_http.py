@@ -0,0 +1,67 @@
+"""
+短连接 vs 长连接池
+
+    python benchmarks/bench_http.py --requests 200
+    python benchmarks/bench_http.py --url https://h5.qzone.qq.com/ --requests 20
+
+默认在本地启动替身服务（benchmarks/stub_qzone.py），分别用裸 requests.get
+和 httpClient 的长连接会话请求同一地址，对比各阶段平均耗时。
+"""
+
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpClient
+import stub_qzone
+
+STAGES = ["dns", "connect", "tls", "ttfb", "total"]
+
+
+def summarize(name, samples):
+    print(f"\n{name}（{len(samples)} 次）")
+    for stage in STAGES:
+        values = [s[stage] * 1000 for s in samples]
+        print(f"  {stage:8s} 平均 {statistics.mean(values):8.2f} ms   p95 {sorted(values)[int(len(values) * 0.95) - 1]:8.2f} ms")
+    reused = sum(1 for s in samples if s["reused"])
+    print(f"  复用连接 {reused}/{len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        server = stub_qzone.serve(port=0, latency=args.latency, background=True)
+        url = f"http://127.0.0.1:{server.server_address[1]}/cgi-bin/friendshow/cgi_get_visitor_more?page=1"
+
+    # 裸 requests.get：每次新建会话和连接
+    cold = []
+    for _ in range(args.requests):
+        _, t = httpClient.timed_get(httpClient.make_session(), url, timeout=10)
+        cold.append(t)
+
+    # 长连接会话
+    session = httpClient.make_session()
+    warm = []
+    for _ in range(args.requests):
+        _, t = httpClient.timed_get(session, url, timeout=10)
+        warm.append(t)
+
+    summarize("每次新连接（等同 requests.get）", cold)
+    summarize("长连接会话", warm)
+    print(
+        f"\n平均总耗时: {statistics.mean(s['total'] for s in cold) * 1000:.2f} ms -> "
+        f"{statistics.mean(s['total'] for s in warm) * 1000:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+内存存储每条记录的内存占用：原始 dict vs visitRecord.Visit
+
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --sizes 100000 1000000
+
+用 gen_visitors 生成分段日志，在独立子进程里分别以 compact_records = false / true 加载 VisitorStore，
+tracemalloc 统计加载后仍存活的内存（记录本身 + 时间数组 + 倒排表 + 去重键），
+另起一次不开 tracemalloc 的子进程测加载耗时。
+比较前先校验两种记录的 dict(r)、JSON 和 Excel 行完全一致。
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+import excelExport
+import gen_visitors
+import visitorLog
+import visitorStore
+import visitRecord
+
+
+def check_output(n=20000):
+    for r in gen_visitors.iter_records(n, seed=3):
+        raw = json.loads(json.dumps(r, ensure_ascii=False))
+        v = visitRecord.Visit(raw)
+        assert dict(v) == raw and list(v) == list(raw), raw
+        assert json.dumps(v.to_dict(), ensure_ascii=False) == json.dumps(raw, ensure_ascii=False)
+        assert excelExport.record_row(v) == excelExport.record_row(raw)
+
+
+def worker(log_dir, compact, trace):
+    log = visitorLog.open_log(log_dir, readonly=True)
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    store = visitorStore.VisitorStore(log, compact=compact)
+    n = store.load()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    result = {"records": n, "load_seconds": elapsed}
+    if trace:
+        result["bytes"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    return result
+
+
+def measure(log_dir, compact):
+    def run(trace):
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", log_dir, "--compact", str(int(compact))]
+        if trace:
+            cmd.append("--trace")
+        return json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+
+    traced = run(True)
+    traced["load_seconds"] = run(False)["load_seconds"]
+    return traced
+
+
+def run_size(n):
+    workdir = tempfile.mkdtemp(prefix="bench_memory_")
+    try:
+        log_dir = os.path.join(workdir, "db")
+        gen_visitors.write_log(log_dir, gen_visitors.iter_records(n))
+        before = measure(log_dir, False)
+        after = measure(log_dir, True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n== {n:,} 条记录 ==")
+    for label, r in (("dict", before), ("Visit", after)):
+        print(
+            f"  {label:6s} {r['bytes'] / r['records']:8.0f} 字节/条"
+            f"   合计 {r['bytes'] / 1024 / 1024:8.1f} MiB   加载 {r['load_seconds']:.2f}s"
+        )
+    print(f"  节省 {(1 - after['bytes'] / before['bytes']) * 100:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--compact", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, bool(args.compact), args.trace)))
+        return
+
+    check_output()
+    print("✅ dict / Visit 输出一致")
+    for n in args.sizes:
+        run_size(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+限流器：大量不同 IP 冲击下的吞吐和内存
+
+    python benchmarks/bench_qos.py --ips 200000 --requests 1000000
+
+对比原来的 defaultdict(deque) 实现和 rateLimit.TokenBucketLimiter：
+每次请求随机取一个 IP（含大量只出现一次的伪造 X-Forwarded-For），
+统计每秒检查次数、限流表条目数和 tracemalloc 记录的内存峰值。
+tracemalloc 会拖慢每次分配，吞吐和内存分两遍测，各用一个新的限流器。
+令牌桶另测一遍 max_entries 不小于 IP 数的情况，区分命中路径和 LRU 淘汰的开销。
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import rateLimit
+
+
+class DequeLimiter:
+    """原 weeklyReport.qos_check 的实现"""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.buckets = defaultdict(deque)
+
+    def allow(self, ip):
+        now = time.time()
+        bucket = self.buckets[ip]
+        while bucket and now - bucket[0] > self.window:
+            bucket.popleft()
+        if len(bucket) >= self.limit:
+            return False
+        bucket.append(now)
+        return True
+
+    def __len__(self):
+        return len(self.buckets)
+
+
+def make_ips(n_ips, n_requests, hot_ratio, seed=1):
+    """hot_ratio 的请求来自 100 个固定 IP，其余来自 n_ips 个随机 IP"""
+    rnd = random.Random(seed)
+    hot = [f"10.0.0.{i}" for i in range(100)]
+    return [
+        rnd.choice(hot) if rnd.random() < hot_ratio else f"fake-{rnd.randrange(n_ips)}"
+        for _ in range(n_requests)
+    ]
+
+
+def run(name, make, ips):
+    limiter = make()
+    allow = limiter.allow
+    t0 = time.perf_counter()
+    allowed = 0
+    for ip in ips:
+        allowed += allow(ip)
+    elapsed = time.perf_counter() - t0
+
+    limiter = make()
+    allow = limiter.allow
+    tracemalloc.start()
+    for ip in ips:
+        allow(ip)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:20s} {len(ips) / elapsed:12,.0f} 次/秒   条目 {len(limiter):>9,}   "
+        f"内存峰值 {peak / 1024 / 1024:8.1f} MB   放行 {allowed:,}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ips", type=int, default=200000, help="不同伪造 IP 的数量")
+    parser.add_argument("--requests", type=int, default=1000000)
+    parser.add_argument("--hot-ratio", type=float, default=0.2)
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--window", type=float, default=1)
+    parser.add_argument("--max-ips", type=int, default=100000)
+    args = parser.parse_args()
+
+    ips = make_ips(args.ips, args.requests, args.hot_ratio)
+    print(f"{args.requests:,} 次请求，{args.ips:,} 个伪造 IP，热点占比 {args.hot_ratio}")
+
+    run("deque", lambda: DequeLimiter(args.limit, args.window), ips)
+    run(
+        "token-bucket",
+        lambda: rateLimit.TokenBucketLimiter(args.limit, args.window, max_entries=args.max_ips),
+        ips,
+    )
+    run(
+        "token-bucket-noevict",
+        lambda: rateLimit.TokenBucketLimiter(args.limit, args.window, max_entries=args.ips + 100),
+        ips,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+采集端与报表热点路径的基准套件
+
+    python benchmarks/bench_suite.py --sizes 10000 100000 1000000 --out bench.json
+    python benchmarks/bench_suite.py --sizes 100000 --baseline bench.json --threshold 0.2
+
+每个规模在单独的子进程里运行（weeklyReport / app 在导入时按当前目录的 config.json 初始化）：
+临时目录中用 gen_visitors 生成分段日志、写最小配置和 Cookie，启动本地替身服务
+（stub_qzone）后导入 app，依次测量：
+
+    collector.run_task        抓第 1 页（本地 HTTP）+ 去重 + 追加 + 通知索引，每次 visits_per_poll 条新访客（不补抓）
+    collector.merge           同上，去掉 HTTP：直接合并一页已解析的记录
+    store.append              只追加新记录（原 append_to_json）
+    data.save_indexes         保存小时汇总 / 首次访问 / 每日计数 / 报表缓存（原 save_data）
+    report.full               generate_weekly_report_full(0) / (-1)
+    report.custom.<scale>     generate_weekly_report，本周，900 / 3600 / 86400 秒
+    report.custom.30d         generate_weekly_report，近 30 天，3600 秒
+    top10                     get_week_top10_users
+    query_uin.hot / cold      query_uin_records，访问最多 / 较少的访客
+
+报表函数都直接调用，不经过报表缓存。结果按 {规模: {用例: {best_ms, median_ms}}} 写成 JSON；
+给出 --baseline 时逐项对比中位数，慢了超过 threshold（且绝对差超过 --min-ms）记为回归，退出码 1。
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+import gen_visitors
+
+UIN = 10000
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"best_ms": round(min(samples), 4), "median_ms": round(statistics.median(samples), 4)}
+
+
+# ---------- 子进程：单个规模 ----------
+
+def setup(workdir, size, stub_port):
+    config = {
+        "db_file": os.path.join(workdir, "bench_db.json"),
+        "log_file": os.path.join(workdir, "access.log"),
+        "storage": {"backend": "memory", "engine": "python"},
+        # 采集期间不导出 Excel（全表重写会淹没被测路径）；
+        # 替身服务连续轮询时新旧访客时间交错，会频繁触发补抓，这里只测稳定状态的单页轮询
+        "excel": {"every_records": 10 ** 12, "every_seconds": 10 ** 9},
+        "backfill": {"fanout": 0},
+        "qos": {"limit": 10 ** 9, "window": 1},
+        "cache": {"capacity": 256, "ttl": 15, "persist": True},
+        "server": {"mode": "split", "host": "127.0.0.1", "port": 0, "refresh_interval": 15},
+        "admin": {"token": "bench", "ips": [], "secret_key": "bench"},
+        "visitor": {
+            "UIN": UIN,
+            "nickname": "bench",
+            "interval": 5,
+            "api_base": f"http://127.0.0.1:{stub_port}",
+            "cookie_file": os.path.join(workdir, "cookies.json"),
+        },
+    }
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False)
+    with open(os.path.join(workdir, "cookies.json"), "w", encoding="utf-8") as f:
+        json.dump({"p_skey": "bench", "g_tk": 1}, f)
+
+    t0 = time.perf_counter()
+    gen_visitors.write_log(os.path.join(workdir, "bench_db"), gen_visitors.iter_records(size))
+    return time.perf_counter() - t0
+
+
+def worker(size, repeat, polls, visits_per_poll):
+    import stub_qzone
+
+    server = stub_qzone.serve(port=0, visits_per_poll=visits_per_poll, background=True)
+    workdir = tempfile.mkdtemp(prefix=f"bench_suite_{size}_")
+    results = {}
+    try:
+        results["generate"] = {"seconds": round(setup(workdir, size, server.server_address[1]), 3)}
+        os.chdir(workdir)
+
+        t0 = time.perf_counter()
+        import app
+        import weeklyReport
+        results["load"] = {"seconds": round(time.perf_counter() - t0, 3)}
+
+        acc = app.ACCOUNTS[0]
+        data = acc.data
+        acc.recent.rebuild(acc.store)
+
+        # ---- 采集端 ----
+        results["collector.run_task"] = timed(acc.run_task, polls)
+
+        # 输入都预先生成，计时只包含被测路径
+        feed = stub_qzone.VisitorFeed(visits_per_poll, seed=5)
+        pages = iter([[app.parse_visitor(i) for i in feed.poll(1)] for _ in range(polls)])
+        # 与 run_task 同样：30 条一页，其中 visits_per_poll 条是新的
+        results["collector.merge"] = timed(lambda: acc.merge(next(pages)), polls)
+
+        now = int(time.time())
+        fresh = iter([
+            dict(r, time=now + i) for i, r in enumerate(
+                gen_visitors.iter_records(visits_per_poll * polls + repeat + 3, seed=7)
+            )
+        ])
+        results["store.append"] = timed(
+            lambda: acc.append_records([next(fresh) for _ in range(visits_per_poll)]), polls
+        )
+
+        def save():
+            # 每次先追加一条，让各索引都有改动需要落盘
+            acc.append_records([next(fresh)])
+            data.save_indexes()
+        results["data.save_indexes"] = timed(save, max(3, repeat))
+
+        # ---- 报表 ----
+        key = data.key
+        week_start, week_end = weeklyReport.week_range(0)
+        results["report.full"] = timed(lambda: weeklyReport.generate_weekly_report_full(0, key), repeat)
+        results["report.full.prev"] = timed(lambda: weeklyReport.generate_weekly_report_full(-1, key), repeat)
+        for scale in (900, 3600, 86400):
+            results[f"report.custom.{scale}"] = timed(
+                lambda: weeklyReport.generate_weekly_report(
+                    start_ts=week_start, end_ts=week_end, bucket_seconds=scale, account=key
+                ),
+                repeat,
+            )
+        now = int(time.time())
+        now -= now % 3600
+        results["report.custom.30d"] = timed(
+            lambda: weeklyReport.generate_weekly_report(
+                start_ts=now - 30 * 86400, end_ts=now, bucket_seconds=3600, account=key
+            ),
+            repeat,
+        )
+        results["top10"] = timed(lambda: weeklyReport.get_week_top10_users(key), repeat)
+
+        ranked = gen_visitors.ranked_uins(size)
+        hot, cold = str(ranked[0]), str(ranked[len(ranked) // 2])
+        results["query_uin.hot"] = timed(lambda: weeklyReport.query_uin_records(hot, 200, None, key), repeat)
+        results["query_uin.cold"] = timed(lambda: weeklyReport.query_uin_records(cold, 200, None, key), repeat)
+
+        results["records"] = {"count": len(acc.store)}
+        weeklyReport.ACCESS_LOG.close()
+        data.save_indexes()
+    finally:
+        server.shutdown()
+        os.chdir(HERE)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# ---------- 主进程 ----------
+
+def run_size(size, args):
+    fd, out = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--worker",
+            "--size", str(size), "--repeat", str(args.repeat),
+            "--polls", str(args.polls), "--visits-per-poll", str(args.visits_per_poll),
+            "--out", out,
+        ]
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL if not args.verbose else None)
+        with open(out, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(out)
+
+
+def compare(results, baseline, threshold, min_ms):
+    """返回回归项 [(规模, 用例, 基线 ms, 本次 ms)]"""
+    regressions = []
+    for size, cases in results.items():
+        base_cases = baseline.get(size, {})
+        for name, r in cases.items():
+            b = base_cases.get(name)
+            if not b or "median_ms" not in r or "median_ms" not in b:
+                continue
+            old, new = b["median_ms"], r["median_ms"]
+            if new > old * (1 + threshold) and new - old > min_ms:
+                regressions.append((size, name, old, new))
+    return regressions
+
+
+def print_table(results, baseline=None):
+    for size, cases in results.items():
+        print(f"\n== {int(size):,} 条记录 ==")
+        base_cases = (baseline or {}).get(size, {})
+        for name, r in cases.items():
+            if "median_ms" not in r:
+                print(f"  {name:24s} {json.dumps(r, ensure_ascii=False)}")
+                continue
+            line = f"  {name:24s} 中位 {r['median_ms']:10.3f} ms   最快 {r['best_ms']:10.3f} ms"
+            b = base_cases.get(name)
+            if b and b.get("median_ms"):
+                line += f"   基线 {b['median_ms']:10.3f} ms ({(r['median_ms'] / b['median_ms'] - 1) * 100:+6.1f}%)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5, help="报表类用例的重复次数")
+    parser.add_argument("--polls", type=int, default=50, help="采集类用例的重复次数")
+    parser.add_argument("--visits-per-poll", type=int, default=5)
+    parser.add_argument("--out", default=None, help="结果 JSON")
+    parser.add_argument("--baseline", default=None, help="对比的基线结果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="中位数变慢超过该比例视为回归")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="绝对差小于该值的不算回归（排除噪声）")
+    parser.add_argument("--verbose", action="store_true", help="显示子进程输出")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        results = worker(args.size, args.repeat, args.polls, args.visits_per_poll)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f)
+        return
+
+    results = {}
+    for size in args.sizes:
+        print(f"运行 {size:,} 条记录 ...", flush=True)
+        results[str(size)] = run_size(size, args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "repeat": args.repeat,
+                    "polls": args.polls,
+                    "visits_per_poll": args.visits_per_poll,
+                },
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.out}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.min_ms)
+        for size, name, old, new in regressions:
+            print(f"⚠️ 回归 {int(size):,} 条 {name}: {old:.3f} ms -> {new:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"\n✅ 没有超过 {args.threshold:.0%} 的回归")
+
+
+if __name__ == "__main__":
+    main()
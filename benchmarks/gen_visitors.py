@@ -0,0 +1,168 @@
+"""
+合成访客数据
+
+    python benchmarks/gen_visitors.py --records 1000000 --out ./qzone_visitor_db_bench
+    python benchmarks/gen_visitors.py --records 100000 --legacy-json ./qzone_visitor_db_bench.json
+
+字段与 app.parse_visitor 的输出一致，分布尽量贴近真实空间：
+    访客      Zipf 分布，少数熟人贡献大部分访问
+    时间      按天推进，一天内有作息（凌晨少、晚上多），每天的量有波动
+    说说      约六成访问带说说 ID，越新的说说被访问得越多
+按天生成、按时间顺序流式写出，1e7 条也不需要把全部记录放进内存。
+默认写成分段日志目录（visitorLog 格式），也可以写成旧版 JSON 数组。
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import visitorLog
+
+DAY = 86400
+
+# 一天 24 小时的相对访问量（0 点开始）
+HOUR_WEIGHTS = [
+    4, 2, 1, 1, 1, 1, 2, 4,
+    7, 8, 8, 9, 10, 9, 8, 8,
+    9, 10, 11, 13, 15, 16, 14, 9,
+]
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def zipf_weights(n, s=1.1):
+    return _cumulative(1 / (i + 1) ** s for i in range(n))
+
+
+def _uin_ranking(rnd, users):
+    """排名 -> uin，打乱后熟人不集中在某一段号码上"""
+    return rnd.sample(range(10_000_000, 10_000_000 + users * 50), users)
+
+
+def ranked_uins(n, users=None, seed=42):
+    """与 iter_records 相同参数下按访问量从高到低排名的 uin（查询基准用）"""
+    return _uin_ranking(random.Random(seed), users or max(100, n // 20))
+
+
+def iter_records(n, end=None, days=None, users=None, seed=42):
+    """按时间顺序生成 n 条记录"""
+    rnd = random.Random(seed)
+    end = int(end or time.time())
+    days = days or max(30, min(730, n // 2000))
+    users = users or max(100, n // 20)
+
+    user_cum = zipf_weights(users)
+    user_total = user_cum[-1]
+    uins = _uin_ranking(rnd, users)
+    hour_cum = _cumulative(HOUR_WEIGHTS)
+    hour_total = hour_cum[-1]
+
+    start_day = end - days * DAY
+    start_day -= start_day % DAY
+    per_day = n / days
+    produced = 0
+
+    for day in range(days):
+        if produced >= n:
+            break
+        # 每天的量在均值上下波动，最后一天补齐余数
+        if day == days - 1:
+            count = n - produced
+        else:
+            count = min(n - produced, max(0, int(rnd.gauss(per_day, per_day * 0.3))))
+        day_ts = start_day + day * DAY
+
+        batch = []
+        for _ in range(count):
+            hour = bisect.bisect(hour_cum, rnd.random() * hour_total)
+            t = day_ts + hour * 3600 + rnd.randrange(3600)
+            if t > end:
+                t = end - rnd.randrange(3600)
+            rank = bisect.bisect(user_cum, rnd.random() * user_total)
+            uin = uins[rank]
+
+            sid = ""
+            if rnd.random() < 0.6:
+                # 说说大约两天一条，访问偏向最近发的
+                age = int(rnd.expovariate(1 / 3))
+                sid = f"{(day - age) // 2 + 100000:08x}"
+
+            batch.append({
+                "time": t,
+                "time_str": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)),
+                "uin": uin,
+                "name": f"访客{uin % 100000}",
+                "src": rnd.choice((0, 1, 41)),
+                "platform_src": rnd.choice((1, 2, 3)),
+                "service_src": 0,
+                "hide_from": 0,
+                "is_hide_visit": 0,
+                "yellow": rnd.choice((-1, 0, 3)),
+                "supervip": 0,
+                "shuoshuo_id": sid,
+            })
+
+        batch.sort(key=lambda r: r["time"])
+        produced += len(batch)
+        yield from batch
+
+
+def write_log(log_dir, records, chunk=50000, segment_bytes=visitorLog.DEFAULT_SEGMENT_BYTES):
+    log = visitorLog.open_log(log_dir, segment_bytes=segment_bytes)
+    total = 0
+    buf = []
+    for r in records:
+        buf.append(r)
+        if len(buf) >= chunk:
+            log.append(buf)
+            total += len(buf)
+            buf = []
+    if buf:
+        log.append(buf)
+        total += len(buf)
+    return total
+
+
+def write_legacy_json(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(list(records), f, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=None, help="覆盖的天数，默认按条数估算")
+    parser.add_argument("--users", type=int, default=None, help="不同访客数，默认条数的 1/20")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="分段日志目录")
+    parser.add_argument("--legacy-json", default=None, help="旧版 JSON 数组文件")
+    args = parser.parse_args()
+
+    if not args.out and not args.legacy_json:
+        parser.error("需要 --out 或 --legacy-json")
+
+    records = iter_records(args.records, days=args.days, users=args.users, seed=args.seed)
+    t0 = time.perf_counter()
+    if args.out:
+        n = write_log(args.out, records)
+        target = args.out
+    else:
+        records = list(records)
+        write_legacy_json(args.legacy_json, records)
+        n = len(records)
+        target = args.legacy_json
+    elapsed = time.perf_counter() - t0
+    print(f"已生成 {n:,} 条记录 -> {target}（{elapsed:.1f}s，{n / elapsed:,.0f} 条/秒）")
+
+
+if __name__ == "__main__":
+    main()
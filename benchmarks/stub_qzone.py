@@ -0,0 +1,106 @@
+"""
+本地 cgi_get_visitor_more 替身服务
+
+    python benchmarks/stub_qzone.py --port 8899 --visits-per-poll 5
+
+返回与线上相同的 JSONP 结构（_Callback({...});），每次请求按时间推进生成新访客，
+用于在不访问 QQ 空间的情况下测量采集端的网络开销和合并/保存路径。
+把 config.json 的 visitor.api_base 改为 http://127.0.0.1:8899 即可让 app.py 连到这里。
+"""
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_item(rnd, t):
+    item = {
+        "uin": rnd.randint(10000, 10000 + 5000),
+        "name": f"访客{rnd.randint(1, 500)}",
+        "time": t,
+        "src": rnd.choice([0, 1, 41]),
+        "platform_src": rnd.choice([1, 2, 3]),
+        "service_src": 0,
+        "hide_from": 0,
+        "is_hide_visit": 0,
+        "yellow": rnd.choice([-1, 0, 3]),
+        "supervip": 0,
+    }
+    if rnd.random() < 0.5:
+        item["shuoshuoes"] = [{"id": f"ss{rnd.randint(1, 50):04d}"}]
+    return item
+
+
+class VisitorFeed:
+    """按页提供最新访客，每页 page_size 条，新的在前"""
+
+    def __init__(self, visits_per_poll=5, page_size=30, seed=1):
+        self.rnd = random.Random(seed)
+        self.visits_per_poll = visits_per_poll
+        self.page_size = page_size
+        self.items = []
+        self.lock = threading.Lock()
+
+    def poll(self, page):
+        with self.lock:
+            if page == 1:
+                now = int(time.time())
+                for _ in range(self.visits_per_poll):
+                    self.items.append(make_item(self.rnd, now - self.rnd.randint(0, 4)))
+                self.items.sort(key=lambda x: x["time"])
+            newest_first = self.items[::-1]
+            lo = (page - 1) * self.page_size
+            return newest_first[lo:lo + self.page_size]
+
+
+def make_handler(feed, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持长连接
+
+        def setup(self):
+            super().setup()
+            # 响应头和响应体分两次写出，关掉 Nagle 避免长连接上的 40ms 延迟确认
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            qs = parse_qs(urlparse(self.path).query)
+            page = int(qs.get("page", ["1"])[0])
+            if latency:
+                time.sleep(latency)
+            payload = {"code": 0, "data": {"items": feed.poll(page)}}
+            body = f"_Callback({json.dumps(payload, ensure_ascii=False)});".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-javascript; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8899, visits_per_poll=5, page_size=30, latency=0.0, background=False):
+    feed = VisitorFeed(visits_per_poll, page_size)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(feed, latency))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"替身服务已启动: http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--visits-per-poll", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0, help="每次响应前的额外延迟（秒）")
+    args = parser.parse_args()
+    serve(args.port, args.visits_per_poll, args.page_size, args.latency)
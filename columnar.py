@@ -0,0 +1,154 @@
+"""
+列式 NumPy 引擎（可选，storage.engine = "numpy"）
+
+按时间排序的并行数组：
+    times   int64   访问时间
+    uins    int64   访客 QQ：非负整数原样保存，没有 uin 字段为 -1，
+                    其余（None、字符串、负数等）按 (类型, 值) 编码为 -2、-3 ...
+    sids    int32   说说 id 字典编码（空为 -1）
+
+区间用 searchsorted 定位，分桶和说说序列用 bincount 向量化统计。
+输出与 visitorStore.VisitorStore 的纯 Python 实现逐项一致（包括同票时的先后顺序）。
+新记录先进缓冲区，下次查询前合并，采集端追加不受影响。
+"""
+
+import threading
+
+import numpy as np
+
+NO_UIN = -1
+NO_SID = -1
+_MISSING = object()
+
+
+class ColumnarIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.times = np.empty(0, dtype=np.int64)
+        self.uins = np.empty(0, dtype=np.int64)
+        self.sids = np.empty(0, dtype=np.int32)
+
+        # 说说 id 字典编码
+        self.sid_names = []
+        self._sid_codes = {}
+
+        # 非“非负整数”uin 的编码（负数，避开 -1）；按类型区分，
+        # 与纯 Python 实现的集合去重一致："123" 与 123 是不同访客，None 也算一个访客
+        self._uin_codes = {}
+
+        self._pending = []
+
+    # ---------- 编码 ----------
+
+    def _encode_sid(self, sid):
+        if not sid:
+            return NO_SID
+        code = self._sid_codes.get(sid)
+        if code is None:
+            code = len(self.sid_names)
+            self._sid_codes[sid] = code
+            self.sid_names.append(sid)
+        return code
+
+    def _encode_uin(self, uin):
+        if uin is _MISSING:
+            return NO_UIN
+        if type(uin) is int and 0 <= uin < 2 ** 63:
+            return uin
+        key = (type(uin), uin)
+        code = self._uin_codes.get(key)
+        if code is None:
+            code = -2 - len(self._uin_codes)
+            self._uin_codes[key] = code
+        return code
+
+    # ---------- 写入 ----------
+
+    def extend(self, records):
+        """存储订阅回调：只进缓冲区"""
+        with self._lock:
+            self._pending.extend(records)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        t = np.fromiter(((r.get("time") or 0) for r in pending), dtype=np.int64, count=len(pending))
+        u = np.fromiter((self._encode_uin(r.get("uin", _MISSING)) for r in pending), dtype=np.int64, count=len(pending))
+        s = np.fromiter((self._encode_sid(r.get("shuoshuo_id")) for r in pending), dtype=np.int32, count=len(pending))
+
+        times = np.concatenate([self.times, t])
+        uins = np.concatenate([self.uins, u])
+        sids = np.concatenate([self.sids, s])
+
+        # 稳定排序，同一时间保持写入顺序
+        if len(times) > 1 and np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind="stable")
+            times, uins, sids = times[order], uins[order], sids[order]
+
+        self.times, self.uins, self.sids = times, uins, sids
+
+    def _slice(self, start_ts, end_ts):
+        self._flush()
+        lo = int(np.searchsorted(self.times, start_ts, side="left"))
+        hi = int(np.searchsorted(self.times, end_ts, side="left"))
+        return lo, hi
+
+    def __len__(self):
+        with self._lock:
+            self._flush()
+            return len(self.times)
+
+    # ---------- 查询 ----------
+
+    def range_counts(self, start_ts, end_ts):
+        """(访问次数, 独立访客)"""
+        with self._lock:
+            lo, hi = self._slice(start_ts, end_ts)
+            uins = np.unique(self.uins[lo:hi])
+            uins = uins[uins != NO_UIN]
+            return hi - lo, int(len(uins))
+
+    def bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        end_ts = start_ts + bucket_seconds * n_buckets
+        with self._lock:
+            lo, hi = self._slice(start_ts, end_ts)
+            t = self.times[lo:hi]
+        t = t[t != 0]
+        idx = (t - start_ts) // bucket_seconds
+        return np.bincount(idx, minlength=n_buckets)[:n_buckets].tolist()
+
+    def shuoshuo_bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        end_ts = start_ts + bucket_seconds * n_buckets
+        with self._lock:
+            lo, hi = self._slice(start_ts, end_ts)
+            t = self.times[lo:hi]
+            s = self.sids[lo:hi]
+            names = list(self.sid_names)
+
+        mask = (s != NO_SID) & (t != 0)
+        t, s = t[mask], s[mask]
+        if len(s) == 0:
+            return {}
+
+        # 按区间内首次出现的顺序输出，与逐条统计的字典顺序一致
+        present, first = np.unique(s, return_index=True)
+        present = present[np.argsort(first, kind="stable")]
+        local = np.empty(len(names), dtype=np.int64)
+        local[present] = np.arange(len(present))
+
+        idx = (t - start_ts) // bucket_seconds
+        flat = local[s] * n_buckets + idx
+        grid = np.bincount(flat, minlength=len(present) * n_buckets).reshape(len(present), n_buckets)
+
+        return {
+            names[code]: grid[i].tolist()
+            for i, code in enumerate(present.tolist())
+        }
+
+
+def build(records):
+    index = ColumnarIndex()
+    index.extend(records)
+    return index
@@ -0,0 +1,45 @@
+"""
+时间序列降采样
+
+/api/report/custom 的点数超过 max_points 时使用：
+    sum   相邻 factor 个桶合并计数，总数不变（直接按 scale × factor 的粒度统计，不生成原始序列）
+    lttb  Largest-Triangle-Three-Buckets，从原始序列中挑出 max_points 个最能保持曲线形状的点，
+          峰值不会被平均掉，适合画图；各点仍是原始桶的计数，不再满足求和不变
+"""
+
+
+def sum_factor(n_raw, max_points):
+    """合并因子：ceil(n_raw / max_points)"""
+    return max(1, -(-n_raw // max_points))
+
+
+def lttb(values, n):
+    """返回选中点的下标（升序，含首尾），n < 3 或点数不超过 n 时原样返回全部下标"""
+    size = len(values)
+    if n >= size or n < 3:
+        return list(range(size))
+
+    every = (size - 2) / (n - 2)
+    selected = [0]
+    a = 0
+
+    for i in range(n - 2):
+        # 下一个桶的平均点作为三角形的第三个顶点
+        lo = int((i + 1) * every) + 1
+        hi = min(int((i + 2) * every) + 1, size)
+        avg_x = (lo + hi - 1) / 2
+        avg_y = sum(values[lo:hi]) / (hi - lo)
+
+        # 当前桶里与上一个选中点、下一桶平均点围成面积最大的点
+        ay = values[a]
+        best, best_area = -1, -1.0
+        for j in range(int(i * every) + 1, lo):
+            area = abs((a - avg_x) * (values[j] - ay) - (a - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+
+        selected.append(best)
+        a = best
+
+    selected.append(size - 1)
+    return selected
@@ -0,0 +1,187 @@
+"""
+后台 Excel 导出
+
+采集循环只负责通知“有新记录”，真正的导出在后台线程中进行：
+    - 累计新记录达到 every_records 条时导出
+    - 有未导出记录且距上次导出超过 every_seconds 秒时导出
+    - 管理后台手动触发时立即导出
+
+per_month=True 时按月份拆成多个工作簿，只重写本次新记录所在的月份。
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+
+import openpyxl
+
+HEADER = ["时间戳(time)", "访问时间", "QQ号(uin)", "昵称(name)", "src", "platform_src", "service_src", "hide_from", "is_hide_visit", "yellow", "supervip", "shuoshuo_id"]
+COLUMN_WIDTHS = {'A': 13, 'B': 20, 'C': 20, 'D': 15, 'L': 30}
+
+logger = logging.getLogger("QzoneMonitor")
+
+
+def record_row(r):
+    return [
+        r['time'], r['time_str'], r['uin'], r['name'], r['src'], r['platform_src'],
+        r['service_src'], r['hide_from'], r['is_hide_visit'], r['yellow'], r['supervip'], r['shuoshuo_id']
+    ]
+
+
+def month_key(ts):
+    return datetime.datetime.fromtimestamp(ts or 0).strftime("%Y-%m")
+
+
+def write_workbook(path, title, records):
+    """write-only 模式流式写出一个工作簿，先写临时文件再替换"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for c, w in COLUMN_WIDTHS.items():
+        ws.column_dimensions[c].width = w
+
+    ws.append(HEADER)
+    for r in records:
+        ws.append(record_row(r))
+
+    tmp = path + ".tmp"
+    wb.save(tmp)
+    os.replace(tmp, path)
+
+
+class ExcelExporter:
+    def __init__(
+        self,
+        excel_file,
+        load_records,
+        every_records=50,
+        every_seconds=60,
+        per_month=False,
+        observe=None
+    ):
+        """
+        excel_file    总表路径；按月模式下作为文件名前缀
+        load_records  无参函数，返回全部记录的可迭代对象
+        observe       可选，每次导出完成后以耗时（秒）调用，用于指标
+        """
+        self.excel_file = excel_file
+        self.load_records = load_records
+        self.every_records = max(1, every_records)
+        self.every_seconds = every_seconds
+        self.per_month = per_month
+        self.observe = observe
+
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._dirty_months = set()
+        self._force = False
+        self._last_export = time.time()
+        self._thread = None
+
+        self.exports = 0
+        self.last_duration = 0.0
+
+    def month_file(self, month):
+        base, ext = os.path.splitext(self.excel_file)
+        return f"{base}_{month}{ext}"
+
+    # ---------- 触发 ----------
+
+    def notify(self, records):
+        """采集到新记录后调用，不做任何 I/O"""
+        if not records:
+            return
+        with self._cond:
+            self._pending += len(records)
+            for r in records:
+                self._dirty_months.add(month_key(r.get('time')))
+            if self._pending >= self.every_records:
+                self._cond.notify()
+
+    def request_export(self):
+        """手动触发：即使没有新记录也重写一次"""
+        with self._cond:
+            self._force = True
+            self._cond.notify()
+
+    def _due(self):
+        if self._force:
+            return True
+        if self._pending >= self.every_records:
+            return True
+        return self._pending > 0 and time.time() - self._last_export >= self.every_seconds
+
+    # ---------- 后台线程 ----------
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="excel-export", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._due():
+                    self._cond.wait(timeout=max(1, self.every_seconds))
+                force = self._force
+                months = self._dirty_months
+                self._pending = 0
+                self._dirty_months = set()
+                self._force = False
+
+            try:
+                self.export(months, force)
+            except Exception as e:
+                logger.error(f"Excel 导出失败: {e}", exc_info=True)
+
+    def flush(self):
+        """退出前同步导出剩余记录"""
+        with self._cond:
+            if not self._pending:
+                return
+            months = self._dirty_months
+            self._pending = 0
+            self._dirty_months = set()
+        self.export(months)
+
+    # ---------- 导出 ----------
+
+    def export(self, months=None, force=False):
+        t0 = time.time()
+        try:
+            if self.per_month:
+                written = self._export_months(None if force else months)
+            else:
+                written = self._export_single()
+        except PermissionError:
+            logger.warning("Excel 被占用，本次未写入")
+            return
+
+        self._last_export = time.time()
+        self.last_duration = self._last_export - t0
+        self.exports += 1
+        if self.observe:
+            self.observe(self.last_duration)
+        logger.info(f"Excel 导出完成：{written} 条，耗时 {self.last_duration:.2f}s")
+
+    def _export_single(self):
+        records = sorted(self.load_records(), key=lambda x: x.get('time') or 0, reverse=True)
+        write_workbook(self.excel_file, "访客记录", records)
+        return len(records)
+
+    def _export_months(self, months):
+        """months 为 None 时导出全部月份"""
+        groups = {}
+        for r in self.load_records():
+            m = month_key(r.get('time'))
+            if months is None or m in months:
+                groups.setdefault(m, []).append(r)
+
+        written = 0
+        for m, records in groups.items():
+            records.sort(key=lambda x: x.get('time') or 0, reverse=True)
+            write_workbook(self.month_file(m), m, records)
+            written += len(records)
+        return written
@@ -0,0 +1,134 @@
+"""
+访客首次出现时间索引
+
+    first[uin] = 该访客最早一次访问的时间
+
+随新记录增量更新，由 indexSaver 在后台线程保存在数据库旁边（<db>.firstseen.json）。
+“新增访客”即首次出现时间落在区间内的访客，另外维护一份有序的首次出现时间，
+区间内新增访客数用二分查找得到，与区间之前的历史长度无关。
+"""
+
+import bisect
+import json
+import threading
+
+import indexSaver
+
+
+class FirstSeenIndex:
+    def __init__(self, path, save_interval=30, readonly=False):
+        self.path = path
+        self.save_interval = save_interval
+        self.readonly = readonly  # 只读端（Web 进程）不写文件，由采集端保存
+
+        self._lock = threading.Lock()
+        self.first = {}
+        self._sorted = []  # 所有访客的首次出现时间，升序
+        self.count = 0
+
+        self._saver = indexSaver.IndexSaver(
+            path, self._lock, self._snapshot, self._encode, save_interval, name="save-firstseen"
+        )
+
+    # ---------- 增量更新 ----------
+
+    def _add(self, records):
+        for r in records:
+            self.count += 1
+            t = r.get("time")
+            if not t or "uin" not in r:
+                continue
+            uin = r["uin"]
+            old = self.first.get(uin)
+            if old is None:
+                self.first[uin] = t
+                bisect.insort(self._sorted, t)
+            elif t < old:
+                # 补录到更早的记录
+                self.first[uin] = t
+                del self._sorted[bisect.bisect_left(self._sorted, old)]
+                bisect.insort(self._sorted, t)
+
+    def add(self, records):
+        """存储订阅回调"""
+        if not records:
+            return
+        with self._lock:
+            self._add(records)
+        if not self.readonly:
+            self._saver.mark_dirty()
+
+    def rebuild(self, records):
+        with self._lock:
+            self.first = {}
+            self.count = 0
+            for r in records:
+                self.count += 1
+                t = r.get("time")
+                if not t or "uin" not in r:
+                    continue
+                old = self.first.get(r["uin"])
+                if old is None or t < old:
+                    self.first[r["uin"]] = t
+            self._sorted = sorted(self.first.values())
+        self._saver.dirty = True
+        self.save()
+
+    # ---------- 持久化 ----------
+
+    def _snapshot(self):
+        """锁内调用：只做一次 dict 浅拷贝"""
+        return self.count, self.first.copy()
+
+    @staticmethod
+    def _encode(snap):
+        count, first = snap
+        return json.dumps({"count": count, "first": list(first.items())}, ensure_ascii=False)
+
+    def save(self):
+        if self.readonly:
+            return
+        self._saver.save()
+
+    def load(self):
+        """读取持久化的索引，返回其覆盖的记录数；文件缺失或损坏返回 -1"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return -1
+
+        with self._lock:
+            self.first = {uin: t for uin, t in data["first"]}
+            self._sorted = sorted(self.first.values())
+            self.count = data["count"]
+        return self.count
+
+    def sync(self, store):
+        """启动时与存储核对，条数对不上就全量重建"""
+        if self.load() != len(store):
+            print("♻️ 重建首次访问索引")
+            self.rebuild(store.iter_records())
+
+    # ---------- 查询 ----------
+
+    def first_seen(self, uin):
+        return self.first.get(uin)
+
+    def count_new(self, start_ts, end_ts):
+        """首次出现在 [start_ts, end_ts) 内的访客数"""
+        with self._lock:
+            lo = bisect.bisect_left(self._sorted, start_ts)
+            hi = bisect.bisect_left(self._sorted, end_ts)
+            return hi - lo
+
+    def bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        """每个时间桶内的首次访客数"""
+        values = [0] * n_buckets
+        end_ts = start_ts + bucket_seconds * n_buckets
+        with self._lock:
+            lo = bisect.bisect_left(self._sorted, start_ts)
+            hi = bisect.bisect_left(self._sorted, end_ts)
+            for t in self._sorted[lo:hi]:
+                values[(t - start_ts) // bucket_seconds] += 1
+        return values
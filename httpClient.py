@@ -0,0 +1,121 @@
+"""
+采集端 HTTP 客户端
+
+长连接 + 连接池的 requests.Session，并记录每次请求的耗时：
+    dns      域名解析（复用连接时为 0）
+    connect  TCP 建连
+    tls      TLS 握手
+    ttfb     发出请求到收到响应头（含以上建连时间）
+    total    整个请求（含读取响应体）
+    reused   是否复用了已有连接
+"""
+
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_local = threading.local()
+
+
+def _timings():
+    t = getattr(_local, "timings", None)
+    if t is None:
+        t = _local.timings = {}
+    return t
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        t = _timings()
+        t0 = time.perf_counter()
+
+        # 先单独解析域名计时，再用解析出的地址建连（SNI / Host 仍使用原域名）
+        dns_host = getattr(self, "_dns_host", None)
+        if dns_host:
+            try:
+                infos = socket.getaddrinfo(dns_host, self.port, 0, socket.SOCK_STREAM)
+                self._dns_host = infos[0][4][0]
+            except OSError:
+                infos = None
+        t1 = time.perf_counter()
+
+        try:
+            sock = super()._new_conn()
+        finally:
+            if dns_host:
+                self._dns_host = dns_host
+
+        t2 = time.perf_counter()
+        t["dns"] = t1 - t0
+        t["connect"] = t2 - t1
+        t["reused"] = False
+        return sock
+
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        t = _timings()
+        t["tls"] = max(0.0, time.perf_counter() - t0 - t.get("dns", 0) - t.get("connect", 0))
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def make_session(user_agent=None, pool_size=4):
+    s = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    if user_agent:
+        s.headers.update({"User-Agent": user_agent})
+    return s
+
+
+def timed_get(session, url, **kwargs):
+    """返回 (response, timings)，timings 单位为秒"""
+    _local.timings = {"dns": 0.0, "connect": 0.0, "tls": 0.0, "reused": True}
+
+    t0 = time.perf_counter()
+    res = session.get(url, **kwargs)
+    res.content  # 读完响应体
+    total = time.perf_counter() - t0
+
+    t = dict(_local.timings)
+    t["ttfb"] = res.elapsed.total_seconds()
+    t["total"] = total
+    return res, t
+
+
+def format_timings(t):
+    return (
+        f"dns={t['dns'] * 1000:.1f}ms connect={t['connect'] * 1000:.1f}ms "
+        f"tls={t['tls'] * 1000:.1f}ms ttfb={t['ttfb'] * 1000:.1f}ms "
+        f"total={t['total'] * 1000:.1f}ms reused={'yes' if t['reused'] else 'no'}"
+    )
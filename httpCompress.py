@@ -0,0 +1,78 @@
+"""
+响应压缩
+
+按客户端的 Accept-Encoding 选择编码：装了 brotli 时优先 br，否则 gzip。
+只压缩文本类响应（JSON / HTML / JS / CSS），小于 min_size 的不压缩（省 CPU，收益也小）。
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+COMPRESSIBLE = {
+    "application/json",
+    "application/javascript",
+    "text/html",
+    "text/css",
+    "text/javascript",
+    "text/plain",
+}
+
+
+def accepted(accept_encoding):
+    """解析 Accept-Encoding，返回 q > 0 的编码集合"""
+    result = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0
+        if name and q > 0:
+            result.add(name.lower())
+    return result
+
+
+def negotiate(accept_encoding):
+    encodings = accepted(accept_encoding)
+    if brotli is not None and "br" in encodings:
+        return "br"
+    if "gzip" in encodings:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding, level=6):
+    if encoding == "br":
+        # brotli 的 quality 0-11，与 gzip 的 1-9 大致对应
+        return brotli.compress(body, quality=min(level + 1, 11))
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def compress_response(response, accept_encoding, min_size=1024, level=6):
+    """就地压缩 Flask 响应；流式响应（SSE）、文件直传和已编码的响应原样返回"""
+    if response.is_streamed or response.direct_passthrough:
+        return response
+    if response.mimetype not in COMPRESSIBLE:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if response.status_code != 200 or "Content-Encoding" in response.headers:
+        return response
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(body, encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,73 @@
+"""
+派生索引的后台落盘
+
+小时汇总 / 首次访问 / 每日计数随存储的订阅回调增量更新，回调运行在采集端追加记录的路径上。
+回调里只做标记，写盘交给后台线程：
+    snapshot()   在索引自己的锁内调用，只做廉价的复制（整表浅拷贝，或只拷有改动的部分）
+    encode(snap) 在后台线程里把快照序列化成文件内容，不持有索引的锁
+写临时文件后改名；距上次保存不足 interval 秒时只记下有改动，不唤醒线程。
+save() 在当前线程同步写一次（退出、重建索引时用），与后台线程互斥。
+"""
+
+import os
+import threading
+import time
+
+
+class IndexSaver:
+    def __init__(self, path, lock, snapshot, encode, interval=30, name="index-saver"):
+        self.path = path
+        self.lock = lock
+        self.snapshot = snapshot
+        self.encode = encode
+        self.interval = interval
+        self.name = name
+
+        self.dirty = False
+        self.last_save = 0
+        self.last_seconds = 0.0
+
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def mark_dirty(self):
+        """索引有改动；到了保存间隔就唤醒后台线程"""
+        self.dirty = True
+        if time.time() - self.last_save >= self.interval:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.save()
+            except Exception as e:
+                print(f"保存 {self.path} 出错: {e}")
+
+    def save(self):
+        """有改动时写一次，返回是否写了"""
+        with self._write_lock:
+            with self.lock:
+                if not self.dirty:
+                    return False
+                snap = self.snapshot()
+                self.dirty = False
+
+            t0 = time.perf_counter()
+            try:
+                text = self.encode(snap)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp, self.path)
+            except Exception:
+                self.dirty = True
+                raise
+            self.last_save = time.time()
+            self.last_seconds = time.perf_counter() - t0
+            return True
@@ -0,0 +1,81 @@
+"""
+Server-Sent Events 推送
+
+每个连接一个有界队列；publish() 把事件序列化一次后放进所有订阅者的队列，
+客户端跟不上（队列满）时断开它，浏览器的 EventSource 会自动重连。
+admin_only 的事件只发给管理员连接。
+"""
+
+import json
+import queue
+import threading
+
+
+class Subscriber:
+    def __init__(self, admin, queue_size):
+        self.admin = admin
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflow = False
+
+
+class LiveFeed:
+    def __init__(self, max_clients=100, queue_size=100, heartbeat=15):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.published = 0
+        self.dropped_clients = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, admin=False):
+        """连接数已满返回 None"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            sub = Subscriber(admin, self.queue_size)
+            self._subscribers.add(sub)
+            return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event, data, event_id=None, admin_only=False):
+        if not self._subscribers:
+            return
+        msg = ""
+        if event_id is not None:
+            msg += f"id: {event_id}\n"
+        msg += f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        with self._lock:
+            subs = list(self._subscribers)
+        self.published += 1
+        for sub in subs:
+            if admin_only and not sub.admin:
+                continue
+            try:
+                sub.queue.put_nowait(msg)
+            except queue.Full:
+                sub.overflow = True
+
+    def stream(self, sub, hello=None):
+        """生成 SSE 文本；客户端断开时由 WSGI 服务器关闭生成器"""
+        try:
+            yield "retry: 3000\n\n"
+            if hello is not None:
+                yield f"event: hello\ndata: {json.dumps(hello, ensure_ascii=False)}\n\n"
+            while not sub.overflow:
+                try:
+                    yield sub.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # 心跳注释行，顺便探测断开的连接
+                    yield ": ping\n\n"
+            self.dropped_clients += 1
+        finally:
+            self.unsubscribe(sub)
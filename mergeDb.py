@@ -0,0 +1,340 @@
+"""
+离线合并 / 去重 / 压实历史访客数据库
+
+    python mergeDb.py -o qzone_visitor_db_合并 qzone_visitor_db_a.json qzone_visitor_db_b/ dump.jsonl
+    python mergeDb.py -o qzone_visitor_db_合并 --workers 8 --shard-days 30 old/*.json
+
+输入可以混用：
+    *.json      旧版 JSON 数组（流式解析，不整体载入）
+    目录        分段日志（visitorLog）
+    其它文件    每行一条 JSON 记录（jsonl 导出）
+输出是按时间排序、按 (uin, time) 去重的分段日志目录，把 db_file 指向 <输出目录>.json 即可直接加载，
+各索引文件首次打开时自动重建。
+storage.backend 为 sqlite 且配置了已有的 storage.sqlite_file 时，数据库不会自动重新导入，
+需先运行 python sqliteStore.py <输出目录> --sqlite-file <文件> --rebuild。
+
+多进程外排序，内存只与 --run-records 有关，不随数据总量增长：
+    1. 切分  每个输入文件（jsonl / 分段按 --chunk-mb 字节切块）一个任务，记录按时间分到各时间片，
+            缓冲满 --run-records 条就各片排序后写出一个有序小文件（run）
+    2. 归并  每个时间片一个任务，heapq.merge 流式归并该片的全部 run，相邻的相同 (uin, time) 只留第一条
+            （输入在命令行上越靠前越优先），写出该片的有序结果
+    3. 拼接  各片结果按时间顺序写成分段日志，先写到 <输出目录>.merging 再整体改名
+去重键与采集端一致，只是 uin 统一按字符串比较（不同来源里可能一边是数字一边是字符串）。
+没有整数 time 的行和无法解析的行跳过并计数。
+"""
+
+import argparse
+import concurrent.futures
+import heapq
+import json
+import operator
+import os
+import re
+import shutil
+import sys
+import time
+
+import visitorLog
+
+DAY = 86400
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+# ---------- 读取输入 ----------
+
+def iter_json_array(path, chunk=1 << 20):
+    """流式读取 JSON 数组的各个元素，文件损坏时读到出错处为止"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk).lstrip()
+        if not buf.startswith("["):
+            return
+        pos, eof = 1, False
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if buf.startswith("]", pos):
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # 元素恰好在缓冲区末尾结束时可能被截断（如数字），读入更多再解析
+                complete = end < len(buf) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    return
+                complete = False
+            if complete:
+                yield item
+                pos = end
+                continue
+            more = f.read(chunk)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+
+
+def iter_lines(path, start, end):
+    """读取行首落在 [start, end) 内的各行（按字节切块时每行恰好属于一个块）"""
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                return
+            pos += len(line)
+            yield line
+
+
+def iter_chunk(task):
+    """逐条产出 (记录, 原始行)；JSON 数组没有原始行，之后重新编码"""
+    kind, path, start, end = task
+    if kind == "json":
+        for r in iter_json_array(path):
+            yield r, None
+        return
+    for line in iter_lines(path, start, end):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line), line
+        except ValueError:
+            yield None, None
+
+
+def plan_tasks(inputs, chunk_bytes):
+    """把输入展开成切分任务 (类型, 路径, 起始字节, 结束字节)"""
+    tasks = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files = visitorLog.list_segments(path)
+        elif path.endswith(".json"):
+            tasks.append(("json", path, 0, os.path.getsize(path)))
+            continue
+        else:
+            files = [path]
+        for p in files:
+            size = os.path.getsize(p)
+            for start in range(0, max(size, 1), chunk_bytes):
+                tasks.append(("lines", p, start, min(start + chunk_bytes, size)))
+    return tasks
+
+
+# ---------- 1. 切分 ----------
+
+def record_key(r):
+    """(time, uin 字符串)；没有整数 time 的记录返回 None"""
+    t = r.get("time")
+    if type(t) is not int:
+        return None
+    uin = str(r.get("uin"))
+    if not uin.isdigit():
+        # 键和记录用制表符分隔写进 run 文件，非数字的 uin 转成 JSON 字符串避免混入制表符 / 换行
+        uin = json.dumps(uin, ensure_ascii=False)
+    return t, uin
+
+
+def _write_runs(tmp_dir, task_id, spill, buffers):
+    for shard, rows in buffers.items():
+        rows.sort(key=operator.itemgetter(0, 1))
+        shard_dir = os.path.join(tmp_dir, f"shard-{shard:06d}")
+        os.makedirs(shard_dir, exist_ok=True)
+        path = os.path.join(shard_dir, f"run-{task_id:06d}-{spill:04d}.tsv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{t}\t{uin}\t{line}\n" for t, uin, line in rows)
+
+
+def split_task(task_id, task, tmp_dir, shard_seconds, run_records):
+    """返回 (读取条数, 跳过条数, 读取字节)"""
+    buffers = {}
+    buffered = read = skipped = spill = 0
+    for r, line in iter_chunk(task):
+        key = record_key(r) if isinstance(r, dict) else None
+        if key is None:
+            skipped += 1
+            continue
+        read += 1
+        if line is None:
+            line = json.dumps(r, ensure_ascii=False)
+        else:
+            line = line.decode("utf-8")
+        buffers.setdefault(key[0] // shard_seconds, []).append((key[0], key[1], line))
+        buffered += 1
+        if buffered >= run_records:
+            _write_runs(tmp_dir, task_id, spill, buffers)
+            buffers, buffered, spill = {}, 0, spill + 1
+    if buffers:
+        _write_runs(tmp_dir, task_id, spill, buffers)
+    return read, skipped, task[3] - task[2]
+
+
+# ---------- 2. 归并 ----------
+
+def _iter_run(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            t, uin, record = line.split("\t", 2)
+            yield int(t), uin, record
+
+
+def merge_shard(shard_dir):
+    """归并一个时间片的全部 run，写出 <shard_dir>.jsonl，返回 (写出条数, 重复条数)"""
+    # run 文件名按 (任务号, 溢写序号) 排列，heapq.merge 遇到相同的键时保持输入顺序
+    runs = sorted(os.listdir(shard_dir))
+    merged = heapq.merge(*(_iter_run(os.path.join(shard_dir, n)) for n in runs), key=operator.itemgetter(0, 1))
+
+    written = duplicates = 0
+    last = None
+    with open(shard_dir + ".jsonl", "w", encoding="utf-8") as out:
+        for t, uin, record in merged:
+            if (t, uin) == last:
+                duplicates += 1
+                continue
+            last = (t, uin)
+            out.write(record)
+            written += 1
+
+    shutil.rmtree(shard_dir)
+    return written, duplicates
+
+
+# ---------- 3. 拼接 ----------
+
+def write_log(shard_files, log_dir, segment_bytes):
+    """按顺序把各片结果写成分段日志，返回分段数"""
+    seq, size = 1, 0
+    out = open(os.path.join(log_dir, visitorLog.segment_name(seq)), "wb")
+    try:
+        for path in shard_files:
+            with open(path, "rb") as f:
+                for line in f:
+                    # 与 VisitorLog.append 一致：当前分段写满后再滚动
+                    if size >= segment_bytes:
+                        out.close()
+                        seq, size = seq + 1, 0
+                        out = open(os.path.join(log_dir, visitorLog.segment_name(seq)), "wb")
+                    out.write(line)
+                    size += len(line)
+            os.remove(path)
+    finally:
+        out.close()
+    return seq
+
+
+# ---------- 主流程 ----------
+
+class Progress:
+    def __init__(self, label, total):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.records = 0
+        self.t0 = time.perf_counter()
+        self._last = 0.0
+
+    def update(self, records):
+        self.done += 1
+        self.records += records
+        now = time.perf_counter()
+        if self.done == self.total or now - self._last >= 1:
+            self._last = now
+            elapsed = now - self.t0
+            print(
+                f"  [{self.label}] {self.done}/{self.total}  {self.records:,} 条"
+                f"  {self.records / max(elapsed, 1e-9):,.0f} 条/秒  {elapsed:.1f}s",
+                flush=True,
+            )
+
+
+def merge(inputs, out_dir, workers=None, shard_days=30, run_records=200_000,
+          chunk_mb=64, segment_bytes=visitorLog.DEFAULT_SEGMENT_BYTES, tmp_dir=None):
+    """合并 inputs 到新的分段日志目录 out_dir，返回统计信息"""
+    out_dir = out_dir.rstrip("/\\")
+    building = out_dir + ".merging"
+    tmp_dir = tmp_dir or out_dir + ".merging.tmp"
+    for d in (building, tmp_dir):
+        if os.path.exists(d):
+            shutil.rmtree(d)
+    os.makedirs(building)
+    os.makedirs(tmp_dir)
+
+    t0 = time.perf_counter()
+    stats = {"inputs": len(inputs), "read": 0, "skipped": 0, "bytes": 0, "duplicates": 0, "written": 0}
+    try:
+        tasks = plan_tasks(inputs, int(chunk_mb * 1024 * 1024))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            print(f"🔪 切分：{len(inputs)} 个输入，{len(tasks)} 个任务", flush=True)
+            progress = Progress("切分", len(tasks))
+            jobs = [
+                pool.submit(split_task, i, task, tmp_dir, shard_days * DAY, run_records)
+                for i, task in enumerate(tasks)
+            ]
+            for job in concurrent.futures.as_completed(jobs):
+                read, skipped, nbytes = job.result()
+                stats["read"] += read
+                stats["skipped"] += skipped
+                stats["bytes"] += nbytes
+                progress.update(read)
+
+            names = sorted(os.listdir(tmp_dir), key=lambda n: int(n[len("shard-"):]))
+            shards = [os.path.join(tmp_dir, n) for n in names]
+            print(f"🧮 归并：{len(shards)} 个时间片（每片 {shard_days} 天）", flush=True)
+            progress = Progress("归并", len(shards))
+            for written, duplicates in pool.map(merge_shard, shards):
+                stats["written"] += written
+                stats["duplicates"] += duplicates
+                progress.update(written)
+
+        print("📦 写出分段日志", flush=True)
+        stats["segments"] = write_log([s + ".jsonl" for s in shards], building, segment_bytes)
+        os.replace(building, out_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(building, ignore_errors=True)
+
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线合并 / 去重 / 压实历史访客数据库")
+    parser.add_argument("inputs", nargs="+", help="旧版 JSON 数组、分段日志目录或 jsonl 文件，靠前的优先保留")
+    parser.add_argument("-o", "--out", required=True, help="输出的分段日志目录（不能已存在）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--shard-days", type=int, default=30, help="每个时间片的天数")
+    parser.add_argument("--run-records", type=int, default=200_000, help="切分时每个进程最多缓冲的条数")
+    parser.add_argument("--chunk-mb", type=float, default=64, help="jsonl / 分段按多大的字节块切分任务")
+    parser.add_argument("--segment-mb", type=int, default=8, help="输出分段大小")
+    parser.add_argument("--tmp", default=None, help="临时目录，默认在输出目录旁边")
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        print(f"目标目录已存在：{args.out}")
+        sys.exit(1)
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print(f"输入不存在：{path}")
+            sys.exit(1)
+
+    stats = merge(
+        args.inputs, args.out,
+        workers=args.workers,
+        shard_days=args.shard_days,
+        run_records=args.run_records,
+        chunk_mb=args.chunk_mb,
+        segment_bytes=args.segment_mb * 1024 * 1024,
+        tmp_dir=args.tmp,
+    )
+    seconds = max(stats["seconds"], 1e-9)
+    print(
+        f"✅ 合并完成：读取 {stats['read']:,} 条（{stats['bytes'] / 1024 / 1024:,.1f} MiB），"
+        f"去重 {stats['duplicates']:,} 条，跳过 {stats['skipped']:,} 条，"
+        f"写出 {stats['written']:,} 条 / {stats['segments']} 个分段 -> {args.out}"
+    )
+    print(f"   耗时 {seconds:.1f}s，{stats['read'] / seconds:,.0f} 条/秒，{stats['bytes'] / 1024 / 1024 / seconds:,.1f} MiB/秒")
+
+
+if __name__ == "__main__":
+    main()
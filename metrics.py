@@ -0,0 +1,153 @@
+"""
+进程内指标（Prometheus 文本格式）
+
+    METRICS = metrics.Registry()
+    METRICS.describe("qzone_report_seconds", "histogram", "报表生成耗时")
+    with METRICS.time("qzone_report_seconds", builder="full"):
+        ...
+
+计数器、仪表和直方图都以 (名称, 标签) 为键保存在内存里，snapshot() 导出为
+可 JSON 序列化的列表（分进程部署时采集端把自己的部分写进状态文件），
+render() 把任意来源的列表拼成 /admin/api/metrics 的文本。
+"""
+
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def sample(name, kind, help_text, value, **labels):
+    """构造一条仪表 / 计数器（抓取时临时计算的值用）"""
+    return {"name": name, "type": kind, "help": help_text, "labels": labels, "value": value}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help, buckets)
+        self._values = {}  # (name, labels) -> 数值，或直方图的 [各桶计数, 总和, 次数]
+
+    def describe(self, name, kind, help_text, buckets=DEFAULT_BUCKETS):
+        self._meta[name] = (kind, help_text, tuple(buckets))
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self._meta[name][2]
+        key = self._key(name, labels)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                h = self._values[key] = [[0] * len(buckets), 0.0, 0]
+            for i, le in enumerate(buckets):
+                if value <= le:
+                    h[0][i] += 1
+                    break
+            h[1] += value
+            h[2] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def timed(self, name, **labels):
+        """函数装饰器版的 time()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self, **match):
+        """导出为列表；给出 match 时只导出标签包含这些键值的序列"""
+        want = {(k, str(v)) for k, v in match.items()}
+        with self._lock:
+            items = [
+                (k, [list(v[0]), v[1], v[2]] if isinstance(v, list) else v)
+                for k, v in self._values.items()
+            ]
+
+        series = []
+        for (name, labels), value in items:
+            if not want <= set(labels):
+                continue
+            kind, help_text, buckets = self._meta.get(name, ("untyped", "", ()))
+            s = {"name": name, "type": kind, "help": help_text, "labels": dict(labels)}
+            if kind == "histogram":
+                counts, total, count = value
+                cumulative, acc = [], 0
+                for le, c in zip(buckets, counts):
+                    acc += c
+                    cumulative.append([le, acc])
+                s.update(buckets=cumulative, sum=total, count=count)
+            else:
+                s["value"] = value
+            series.append(s)
+        return series
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(v):
+    if v is None:
+        return "NaN"
+    if isinstance(v, bool):
+        return str(int(v))
+    if isinstance(v, float) and math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render(series):
+    """Prometheus 文本格式（0.0.4），同名序列放在一起，HELP / TYPE 只写一次"""
+    groups = {}
+    for s in series:
+        groups.setdefault(s["name"], []).append(s)
+
+    lines = []
+    for name, items in groups.items():
+        first = items[0]
+        if first.get("help"):
+            lines.append(f"# HELP {name} {first['help']}")
+        lines.append(f"# TYPE {name} {first.get('type', 'untyped')}")
+        for s in items:
+            labels = s.get("labels", {})
+            if first.get("type") == "histogram":
+                for le, c in s["buckets"]:
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(float(le))))} {c}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {s['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(s['sum']))}")
+                lines.append(f"{name}_count{_format_labels(labels)} {s['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(s['value'])}")
+    return "\n".join(lines) + "\n"
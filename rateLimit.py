@@ -0,0 +1,81 @@
+"""
+令牌桶限流
+
+每个 key（客户端 IP）只保存一个浮点数：桶重新装满的时刻 full_at（即 GCRA 的理论到达时间），检查为 O(1)：
+    按 rate = limit / window 的速度补充令牌，最多攒 burst（= limit）个，每次请求消耗一个。
+    消耗一个令牌等于把 full_at 往后推 interval = 1 / rate 秒；
+    full_at 比当前时间超前不到 window 秒（桶里还有令牌）就放行，否则拒绝，拒绝时不改状态。
+    与按 [令牌数, 上次时间] 补充令牌的写法等价，但不用为每个 key 分配列表，命中时只做一次比较和一次赋值。
+表按最近访问排序（LRU），超过 max_entries 时淘汰最久未访问的 key；
+新 key 插入时若距上次清理已过 sweep_interval 秒，顺带清掉空闲超过 idle_seconds 的 key，伪造的 X-Forwarded-For 撑不爆内存。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    def __init__(self, limit, window=1, max_entries=100000, idle_seconds=300, sweep_interval=60):
+        self.rate = limit / window
+        self.burst = limit
+        self.interval = window / limit
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+
+        # 消耗一个令牌后 full_at 最多超前当前时间 window 秒，即消耗前最多超前 window - interval 秒
+        self._max_ahead = window - self.interval + window * 1e-9  # 容忍浮点累加误差
+        self._lock = threading.Lock()
+        self._table = OrderedDict()  # key -> full_at
+        self._next_sweep = time.monotonic() + sweep_interval
+
+        self.evicted = 0
+        self.rejected = 0
+
+    def _sweep(self, now):
+        table = self._table
+        while table:
+            key, full_at = next(iter(table.items()))
+            if now - full_at < self.idle_seconds:
+                break
+            del table[key]
+            self.evicted += 1
+        self._next_sweep = now + self.sweep_interval
+
+    def allow(self, key, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            table = self._table
+            full_at = table.get(key)
+            if full_at is not None:
+                table.move_to_end(key)
+                if full_at < now:
+                    full_at = now
+                elif full_at - now > self._max_ahead:
+                    self.rejected += 1
+                    return False
+                table[key] = full_at + self.interval
+                return True
+
+            if now >= self._next_sweep:
+                self._sweep(now)
+            if len(table) >= self.max_entries:
+                table.popitem(last=False)
+                self.evicted += 1
+            table[key] = now + self.interval
+            return True
+
+    def __len__(self):
+        return len(self._table)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "entries": len(self._table),
+                "evicted": self.evicted,
+                "rejected": self.rejected,
+            }
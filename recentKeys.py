@@ -0,0 +1,117 @@
+"""
+采集端去重状态：高水位 + 最近键窗口
+
+接口按时间倒序返回访客，已保存过的最新时间（高水位）之后的记录一定是新的；
+窗口 [floor, 高水位] 内的记录查最近键集合；早于 floor 的记录只可能是重复。
+集合最多保留 max_keys 个键，超出时淘汰最旧时间的键并抬高 floor，
+所以每次轮询的去重成本只与本次抓到的条数有关，不随数据库增长。
+
+一次轮询（第 1 页 + 补抓）期间用 hold() 冻结 floor 和淘汰：第 1 页会把高水位推到最新，
+若此时按新高水位收缩窗口，停机超过 window 后补抓的较早页面会被整页误判为重复。
+
+启动时只读存储末尾一个窗口的记录重建（store.range），不做全量加载。
+"""
+
+import heapq
+import threading
+from contextlib import contextmanager
+
+
+class RecentKeys:
+    def __init__(self, window=3600, max_keys=20000):
+        self.window = window
+        self.max_keys = max_keys
+
+        self._lock = threading.Lock()
+        self.high_water = 0
+        self.floor = 0
+        self.keys = set()
+        self._heap = []  # (time, uin)，按时间淘汰
+        self._held = 0
+
+        self.skipped_old = 0  # 因早于 floor 被判为重复的条数
+
+    def _advance(self):
+        """高水位前移后收缩窗口，并把集合限制在 max_keys 以内"""
+        if self._held:
+            return
+        self.floor = max(self.floor, self.high_water - self.window)
+        heap = self._heap
+        while heap and (heap[0][0] < self.floor or len(self.keys) > self.max_keys):
+            t = heap[0][0]
+            # 同一秒的键一起淘汰，floor 之下不留残缺的时间点
+            while heap and heap[0][0] == t:
+                _, uin = heapq.heappop(heap)
+                self.keys.discard((uin, t))
+            self.floor = max(self.floor, t + 1)
+
+    def _add(self, records):
+        for r in records:
+            t = r.get("time") or 0
+            if t < self.floor:
+                continue
+            key = (r.get("uin"), t)
+            if key in self.keys:
+                continue
+            self.keys.add(key)
+            heapq.heappush(self._heap, key[::-1])
+            if t > self.high_water:
+                self.high_water = t
+        self._advance()
+
+    @contextmanager
+    def hold(self):
+        """期间 floor 停在进入时的位置、不淘汰键，退出后再统一收缩"""
+        with self._lock:
+            self._held += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held -= 1
+                self._advance()
+
+    def add(self, records):
+        """登记已写入存储的记录"""
+        with self._lock:
+            self._add(records)
+
+    def rebuild(self, store):
+        """从存储末尾一个窗口的记录重建"""
+        newest = store.newest_ts or 0
+        records = store.range(newest - self.window, newest + 1) if newest else []
+        with self._lock:
+            self.high_water = newest
+            self.floor = newest - self.window if newest else 0
+            self.keys = set()
+            self._heap = []
+            self._add(records)
+        return len(self.keys)
+
+    def filter(self, records):
+        """返回未见过的记录（同一批内也去重）"""
+        result = []
+        seen = set()
+        with self._lock:
+            for r in records:
+                t = r.get("time") or 0
+                key = (r.get("uin"), t)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if t > self.high_water:
+                    result.append(r)
+                elif t < self.floor:
+                    self.skipped_old += 1
+                elif key not in self.keys:
+                    result.append(r)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "high_water": self.high_water,
+                "floor": self.floor,
+                "keys": len(self.keys),
+                "skipped_old": self.skipped_old,
+            }
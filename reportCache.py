@@ -0,0 +1,166 @@
+"""
+多键报表缓存（LRU + TTL + 数据版本）
+
+    key = (报表类型, 起点, 终点, 尺度 ...)
+
+区间还没结束（终点晚于最新一条记录）的报表随数据变化，按数据版本号和 TTL 失效；
+终点不晚于最新记录的区间视为已封存，永久缓存，并可保存到磁盘，重启后仍然有效。
+补录了更早的记录时，通过 invalidate_since() 清掉受影响的封存区间。
+
+缓存文件连同保存时的记录条数一起写入；载入时条数对不上（进程停止期间有新记录，
+如 mergeDb 合并、另一个采集进程写入、补抓旧页）就整个丢弃，不会一直返回过期的报表。
+只读打开（分进程模式的 Web worker）只载入不保存，多个 worker 不会互相覆盖同一个文件。
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ReportCache:
+    def __init__(self, version_fn, newest_fn, count_fn, capacity=256, ttl=15, path=None,
+                 save_interval=30, readonly=False):
+        """
+        version_fn  返回当前数据版本号
+        newest_fn   返回最新一条记录的时间
+        count_fn    返回记录条数（各进程一致，作为缓存文件的数据指纹）
+        """
+        self.version_fn = version_fn
+        self.newest_fn = newest_fn
+        self.count_fn = count_fn
+        self.readonly = readonly
+        self.capacity = capacity
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+
+        self._lock = threading.Lock()
+        # key -> (version, created, end_ts, immutable, value)
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+        # 封存区间已经按这么多条记录校验过（on_records 清理后累加）
+        self._count = count_fn()
+        self._dirty = False
+        self._last_save = 0
+
+    # ---------- 读写 ----------
+
+    def _valid(self, entry, version, now):
+        ver, created, _, immutable, _ = entry
+        if immutable:
+            return True
+        return ver == version and now - created < self.ttl
+
+    def get(self, key, end_ts, compute):
+        """命中直接返回，否则调用 compute() 计算并缓存"""
+        version = self.version_fn()
+        newest = self.newest_fn()
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._valid(entry, version, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[4]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            # 封存条件按计算开始前的状态判断：计算期间有新批次（可能推高最新时间，
+            # 也可能补录了区间内的记录）时，这份结果只按版本号缓存，不封存。
+            # 版本号在锁内比较：存储先加版本号再回调 on_records，之后到的批次一定会清理这一项
+            immutable = end_ts <= newest and self.version_fn() == version
+            self._entries[key] = (version, now, end_ts, immutable, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            if immutable:
+                self._dirty = True
+
+        if immutable and now - self._last_save >= self.save_interval:
+            self.save()
+        return value
+
+    def invalidate_since(self, ts):
+        """清掉终点晚于 ts 的封存区间（补录旧记录时调用）"""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e[3] and e[2] > ts]
+            for k in stale:
+                del self._entries[k]
+            if stale:
+                self._dirty = True
+        return len(stale)
+
+    def on_records(self, records):
+        """存储订阅回调：新记录早于已有最新时间时才需要清理"""
+        times = [r.get("time") or 0 for r in records]
+        if times:
+            self.invalidate_since(min(times))
+        with self._lock:
+            self._count += len(records)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def stats(self):
+        with self._lock:
+            immutable = sum(1 for e in self._entries.values() if e[3])
+            return {
+                "entries": len(self._entries),
+                "immutable": immutable,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # ---------- 持久化（只保存封存区间） ----------
+
+    def save(self):
+        if not self.path or self.readonly:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "count": self._count,
+                "entries": [
+                    [list(k), e[2], e[4]]
+                    for k, e in self._entries.items() if e[3]
+                ],
+            }
+            self._dirty = False
+            self._last_save = time.time()
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return 0
+        # 旧格式没有记录条数，无法校验
+        if not isinstance(data, dict) or data.get("count") != self.count_fn():
+            return 0
+
+        newest = self.newest_fn()
+        with self._lock:
+            for key, end_ts, value in data["entries"][-self.capacity:]:
+                # 数据被清空或换库时不再可信
+                if end_ts > newest:
+                    continue
+                self._entries[tuple(key)] = (0, 0, end_ts, True, value)
+        return len(self._entries)
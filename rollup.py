@@ -0,0 +1,141 @@
+"""
+小时汇总表（rollup）
+
+按整点小时累计访问次数：
+    total[hour_ts]            全部访问
+    by_sid[hour_ts][sid]      每条说说
+
+随新记录增量更新，由 indexSaver 在后台线程保存在数据库旁边（<db>.rollup.json）。
+分桶为 3600 整数倍、起点落在整点的时间序列直接对汇总格子求和，
+不再逐条统计原始记录；小于 1 小时的尺度仍由存储后端计算。
+"""
+
+import json
+import threading
+from collections import defaultdict
+
+import indexSaver
+
+HOUR = 3600
+
+
+def hour_of(ts):
+    return ts - ts % HOUR
+
+
+class HourlyRollup:
+    def __init__(self, path, save_interval=30, readonly=False):
+        self.path = path
+        self.save_interval = save_interval
+        self.readonly = readonly  # 只读端（Web 进程）不写文件，由采集端保存
+
+        self._lock = threading.Lock()
+        self.total = defaultdict(int)
+        self.by_sid = defaultdict(lambda: defaultdict(int))
+        self.count = 0
+
+        self._saver = indexSaver.IndexSaver(
+            path, self._lock, self._snapshot, self._encode, save_interval, name="save-rollup"
+        )
+
+    # ---------- 增量更新 ----------
+
+    def _add(self, records):
+        for r in records:
+            self.count += 1
+            t = r.get("time")
+            if not t:
+                continue
+            h = hour_of(t)
+            self.total[h] += 1
+            sid = r.get("shuoshuo_id")
+            if sid:
+                self.by_sid[h][sid] += 1
+
+    def add(self, records):
+        """存储订阅回调"""
+        if not records:
+            return
+        with self._lock:
+            self._add(records)
+        if not self.readonly:
+            self._saver.mark_dirty()
+
+    def rebuild(self, records):
+        with self._lock:
+            self.total = defaultdict(int)
+            self.by_sid = defaultdict(lambda: defaultdict(int))
+            self.count = 0
+            self._add(records)
+        self._saver.dirty = True
+        self.save()
+
+    # ---------- 持久化 ----------
+
+    def _snapshot(self):
+        """锁内调用：浅拷贝各小时的格子（按小时计，数量与数据条数无关）"""
+        return {
+            "count": self.count,
+            "total": dict(self.total),
+            "by_sid": {h: dict(cells) for h, cells in self.by_sid.items()},
+        }
+
+    @staticmethod
+    def _encode(snap):
+        return json.dumps(snap, ensure_ascii=False)
+
+    def save(self):
+        if self.readonly:
+            return
+        self._saver.save()
+
+    def load(self):
+        """读取持久化的汇总表，返回其覆盖的记录数；文件缺失或损坏返回 -1"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return -1
+
+        with self._lock:
+            self.total = defaultdict(int, {int(h): c for h, c in data["total"].items()})
+            self.by_sid = defaultdict(lambda: defaultdict(int))
+            for h, sids in data["by_sid"].items():
+                self.by_sid[int(h)] = defaultdict(int, sids)
+            self.count = data["count"]
+        return self.count
+
+    def sync(self, store):
+        """启动时与存储核对，条数对不上就全量重建"""
+        if self.load() != len(store):
+            print("♻️ 重建小时汇总表")
+            self.rebuild(store.iter_records())
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def covers(start_ts, bucket_seconds):
+        return bucket_seconds % HOUR == 0 and start_ts % HOUR == 0
+
+    def bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        hours = bucket_seconds // HOUR
+        values = []
+        with self._lock:
+            total = self.total
+            for i in range(n_buckets):
+                h0 = start_ts + i * bucket_seconds
+                values.append(sum(total.get(h0 + j * HOUR, 0) for j in range(hours)))
+        return values
+
+    def shuoshuo_bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        result = defaultdict(lambda: [0] * n_buckets)
+        end_ts = start_ts + bucket_seconds * n_buckets
+        with self._lock:
+            for h in range(start_ts, end_ts, HOUR):
+                cells = self.by_sid.get(h)
+                if not cells:
+                    continue
+                idx = (h - start_ts) // bucket_seconds
+                for sid, c in cells.items():
+                    result[sid][idx] += c
+        return result
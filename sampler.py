@@ -0,0 +1,64 @@
+"""
+采样分析器
+
+后台线程每 interval 秒读一次目标线程的调用栈（sys._current_frames），
+按调用链计数，输出 collapsed 格式（"外层;...;内层 次数"），
+可直接交给 flamegraph.pl 或 speedscope 画火焰图。
+只在单个请求上临时开启，开销与采样频率成正比，不影响其它请求。
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval=0.001, max_depth=64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = 0.0
+        self.elapsed = 0.0
+
+    @staticmethod
+    def _frame_name(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            names.append(self._frame_name(frame))
+            frame = frame.f_back
+        self.stacks[";".join(reversed(names))] += 1
+        self.samples += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, name="sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self._started
+        return self
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
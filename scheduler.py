@@ -0,0 +1,107 @@
+"""
+自适应轮询间隔
+
+每次采集后根据结果调整下一次的等待时间（限制在 [min_interval, max_interval]）：
+    到达速率  新记录条数 / 距上次成功采集的秒数，取指数滑动平均；
+              间隔取 target_new / 速率，使每次大约拿到 target_new 条新记录
+    重叠率    本次抓到的记录中已存在的比例；
+              低于 low_overlap 说明一页快装不下了，间隔立即减半
+    无新记录  间隔逐步放大（× grow），深夜自然退到 max_interval
+失败（接口错误、Cookie 失效、网络异常）时按 interval × 2^失败次数 指数退避，上限 max_backoff。
+实际等待时间再叠加 ±jitter 比例的随机抖动，避免多个账号同时请求。
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+
+class AdaptiveScheduler:
+    def __init__(self, interval, min_interval=2, max_interval=60, target_new=10,
+                 low_overlap=0.3, grow=1.5, alpha=0.3, max_backoff=300, jitter=0.1):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        self.target_new = target_new
+        self.low_overlap = low_overlap
+        self.grow = grow
+        self.alpha = alpha
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+        self._lock = threading.Lock()
+        self.rate = None        # 新记录/秒（滑动平均）
+        self.overlap = None     # 最近一次的重叠率
+        self.failures = 0
+        self.delay = self.interval  # 最近一次安排的等待（含退避和抖动）
+        self.last_success = None
+        self.decisions = deque(maxlen=50)
+
+    def _clamp(self, x):
+        return min(max(x, self.min_interval), self.max_interval)
+
+    def _jittered(self, delay):
+        return max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _record(self, reason, **extra):
+        self.decisions.append({
+            "time": int(time.time()),
+            "reason": reason,
+            "interval": round(self.interval, 2),
+            "delay": round(self.delay, 2),
+            **extra,
+        })
+
+    def on_success(self, added, fetched, now=None):
+        """采集成功：added 新增条数，fetched 抓到的总条数；返回下次等待秒数"""
+        now = now or time.time()
+        with self._lock:
+            self.failures = 0
+            overlap = 1 - added / fetched if fetched else 1.0
+            self.overlap = overlap
+
+            if self.last_success is not None:
+                dt = max(now - self.last_success, 1e-3)
+                sample = added / dt
+                self.rate = sample if self.rate is None else self.alpha * sample + (1 - self.alpha) * self.rate
+            self.last_success = now
+
+            if added and overlap < self.low_overlap:
+                self.interval = self._clamp(self.interval / 2)
+                reason = "overlap_low"
+            elif not added:
+                self.interval = self._clamp(self.interval * self.grow)
+                reason = "idle"
+            elif self.rate:
+                self.interval = self._clamp(self.target_new / self.rate)
+                reason = "rate"
+            else:
+                reason = "keep"
+
+            self.delay = self._jittered(self.interval)
+            self._record(reason, added=added, fetched=fetched,
+                         overlap=round(overlap, 3), rate=round(self.rate or 0, 4))
+            return self.delay
+
+    def on_failure(self, kind="error"):
+        """采集失败：指数退避，返回下次等待秒数"""
+        with self._lock:
+            self.failures += 1
+            backoff = min(self.interval * 2 ** min(self.failures, 16), self.max_backoff)
+            self.delay = self._jittered(backoff)
+            self._record(kind, failures=self.failures)
+            return self.delay
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "interval": round(self.interval, 2),
+                "delay": round(self.delay, 2),
+                "min_interval": self.min_interval,
+                "max_interval": self.max_interval,
+                "rate_per_min": round((self.rate or 0) * 60, 2),
+                "overlap": self.overlap,
+                "failures": self.failures,
+                "decisions": list(self.decisions)[-20:],
+            }
@@ -0,0 +1,306 @@
+"""
+SQLite 存储后端（WAL 模式）
+
+索引：
+    time                时间范围筛选 / 分桶统计
+    (uin, time) UNIQUE  去重、单个访客查询、新增访客判断
+    (shuoshuo_id, time) 单条说说统计
+
+与 visitorStore.VisitorStore 提供相同的查询接口，筛选和聚合都在 SQL 里完成。
+WAL 下其他进程（如单独运行的 Web 端）可以直接并发读取，
+refresh() 按 id 增量拉取其他进程写入的新行并通知订阅者（由 visitorData 的监视线程调用）。
+
+分段日志仍是唯一的数据来源，数据库只是它的索引：
+    append() 先落盘到分段日志，再插入数据库，切回 memory 后端不丢数据，日志相关的监控指标照常增长
+    采集端启动时数据库为空才自动从日志导入（单向：日志 -> 数据库，数据库里的行不会写回日志）
+日志在外部被替换或补入了记录（如换成 mergeDb 的输出）而数据库非空时，停掉采集端和 Web 后手动重新导入：
+    python sqliteStore.py qzone_visitor_db                 # 补导入日志里数据库没有的记录
+    python sqliteStore.py qzone_visitor_db --rebuild       # 删掉数据库按日志重建（日志删过记录时用）
+    python sqliteStore.py qzone_visitor_db --sqlite-file visits.sqlite3   # 配置了 storage.sqlite_file 时
+派生索引（小时汇总等）在下次启动时发现条数不一致，会自动重建。
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+
+COLUMNS = [
+    "time", "time_str", "uin", "name", "src", "platform_src",
+    "service_src", "hide_from", "is_hide_visit", "yellow", "supervip", "shuoshuo_id"
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY,
+    time INTEGER NOT NULL,
+    time_str TEXT,
+    uin INTEGER,
+    name TEXT,
+    src,
+    platform_src,
+    service_src,
+    hide_from,
+    is_hide_visit,
+    yellow,
+    supervip,
+    shuoshuo_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_visits_time ON visits(time);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_visits_uin_time ON visits(uin, time);
+CREATE INDEX IF NOT EXISTS idx_visits_sid_time ON visits(shuoshuo_id, time);
+"""
+
+_INSERT = (
+    f"INSERT OR IGNORE INTO visits ({', '.join(COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(COLUMNS))})"
+)
+_SELECT = f"SELECT {', '.join(COLUMNS)} FROM visits"
+_SELECT_WITH_ID = f"SELECT id, {', '.join(COLUMNS)} FROM visits"
+
+
+def _uin_param(uin):
+    uin = str(uin)
+    return int(uin) if uin.isdigit() else uin
+
+
+def default_path(log_dir):
+    return log_dir + ".sqlite3"
+
+
+class SqliteStore:
+    def __init__(self, path, log=None):
+        """log 为分段日志，append() 先写入日志；为 None 时只写数据库（离线工具 / 基准测试用）"""
+        self.path = path
+        self.log = log
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+        self._listeners = []
+        self._last_id = self.version
+
+    def subscribe(self, fn):
+        """fn(records) 在每批新记录写入后调用"""
+        self._listeners.append(fn)
+
+    def seek_latest(self):
+        """已有数据视为已通知过（批量导入后调用）"""
+        self._last_id = self.version
+
+    def _conn(self):
+        """每个线程一个连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    def _scalar(self, sql, params=()):
+        row = self._conn().execute(sql, params).fetchone()
+        return row[0] if row and row[0] is not None else 0
+
+    # ---------- 写入 ----------
+
+    def import_records(self, records, batch=5000):
+        """批量导入，(uin, time) 重复的自动忽略"""
+        total = 0
+        buf = []
+        for r in records:
+            buf.append(tuple(r.get(c) for c in COLUMNS))
+            if len(buf) >= batch:
+                total += self._insert_rows(buf)
+                buf = []
+        if buf:
+            total += self._insert_rows(buf)
+        return total
+
+    def _insert_rows(self, rows):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                before = conn.total_changes
+                conn.executemany(_INSERT, rows)
+                return conn.total_changes - before
+
+    def append(self, records):
+        """落盘到分段日志后一次事务批量插入，返回新的数据版本号"""
+        if records:
+            if self.log is not None:
+                self.log.append(records)
+            self.import_records(records)
+            self.refresh()
+        return self.version
+
+    def refresh(self):
+        """拉取 id 大于上次位置的新行并通知订阅者，返回新增条数"""
+        with self._write_lock:
+            rows = self._query(
+                f"{_SELECT_WITH_ID} WHERE id > ? ORDER BY id", (self._last_id,)
+            )
+            if not rows:
+                return 0
+            self._last_id = rows[-1]["id"]
+
+        new = []
+        for row in rows:
+            r = dict(row)
+            r.pop("id")
+            new.append(r)
+
+        for fn in self._listeners:
+            fn(new)
+        return len(new)
+
+    # ---------- 读取 ----------
+
+    @property
+    def version(self):
+        # 只追加不删除，最大 rowid 即可作为跨进程的数据版本
+        return self._scalar("SELECT MAX(id) FROM visits")
+
+    @property
+    def newest_ts(self):
+        return self._scalar("SELECT MAX(time) FROM visits")
+
+    def count(self):
+        return self._scalar("SELECT COUNT(*) FROM visits")
+
+    def __len__(self):
+        return self.count()
+
+    def _rows_to_dicts(self, rows):
+        return [dict(row) for row in rows]
+
+    def snapshot(self):
+        return self._rows_to_dicts(self._query(f"{_SELECT} ORDER BY time"))
+
+    def iter_records(self):
+        cur = self._conn().execute(f"{_SELECT} ORDER BY time")
+        for row in cur:
+            yield dict(row)
+
+    def range(self, start_ts, end_ts):
+        return self._rows_to_dicts(self._query(
+            f"{_SELECT} WHERE time >= ? AND time < ? ORDER BY time",
+            (start_ts, end_ts)
+        ))
+
+    def count_range(self, start_ts, end_ts):
+        return self._scalar(
+            "SELECT COUNT(*) FROM visits WHERE time >= ? AND time < ?",
+            (start_ts, end_ts)
+        )
+
+    def range_counts(self, start_ts, end_ts):
+        total = self.count_range(start_ts, end_ts)
+        unique = self._scalar(
+            "SELECT COUNT(DISTINCT uin) FROM visits WHERE time >= ? AND time < ? AND uin IS NOT NULL",
+            (start_ts, end_ts)
+        )
+        return total, unique
+
+    def bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        values = [0] * n_buckets
+        rows = self._query(
+            """
+            SELECT (time - ?) / ? AS idx, COUNT(*) FROM visits
+            WHERE time >= ? AND time < ? AND time != 0
+            GROUP BY idx
+            """,
+            (start_ts, bucket_seconds, start_ts, start_ts + bucket_seconds * n_buckets)
+        )
+        for idx, cnt in rows:
+            values[idx] = cnt
+        return values
+
+    def shuoshuo_bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        result = defaultdict(lambda: [0] * n_buckets)
+        rows = self._query(
+            """
+            SELECT shuoshuo_id, (time - ?) / ? AS idx, COUNT(*) FROM visits
+            WHERE time >= ? AND time < ? AND time != 0
+              AND shuoshuo_id IS NOT NULL AND shuoshuo_id != ''
+            GROUP BY shuoshuo_id, idx
+            """,
+            (start_ts, bucket_seconds, start_ts, start_ts + bucket_seconds * n_buckets)
+        )
+        for sid, idx, cnt in rows:
+            result[sid][idx] = cnt
+        return result
+
+    def top_users(self, start_ts, end_ts, k):
+        rows = self._query(
+            """
+            SELECT v.uin, COUNT(*) AS c,
+                (SELECT n.name FROM visits n
+                 WHERE n.uin = v.uin AND n.time >= ? AND n.time < ?
+                   AND n.name IS NOT NULL AND n.name != ''
+                 ORDER BY n.time DESC LIMIT 1) AS name
+            FROM visits v
+            WHERE v.time >= ? AND v.time < ? AND v.uin
+            GROUP BY v.uin
+            ORDER BY c DESC, MIN(v.time)
+            LIMIT ?
+            """,
+            (start_ts, end_ts, start_ts, end_ts, k)
+        )
+        return [(row["uin"], row["name"], row["c"]) for row in rows]
+
+    def unique_total(self):
+        return self._scalar("SELECT COUNT(DISTINCT uin) FROM visits WHERE uin IS NOT NULL")
+
+    def count_uin(self, uin):
+        return self._scalar("SELECT COUNT(*) FROM visits WHERE uin = ?", (_uin_param(uin),))
+
+    def uin_records(self, uin, limit, before=None):
+        if before is None:
+            rows = self._query(
+                f"{_SELECT} WHERE uin = ? ORDER BY time DESC LIMIT ?",
+                (_uin_param(uin), limit)
+            )
+        else:
+            rows = self._query(
+                f"{_SELECT} WHERE uin = ? AND time < ? ORDER BY time DESC LIMIT ?",
+                (_uin_param(uin), before, limit)
+            )
+        return self._rows_to_dicts(rows)
+
+
+def main():
+    import visitorLog
+
+    parser = argparse.ArgumentParser(description="把分段日志（重新）导入 SQLite 存储（先停掉采集端和 Web）")
+    parser.add_argument("log_dir", help="分段日志目录（db_file 去掉 .json）")
+    parser.add_argument("--sqlite-file", default=None, help="数据库文件，默认 <log_dir>.sqlite3")
+    parser.add_argument("--rebuild", action="store_true", help="删掉已有数据库，按日志重建")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.log_dir):
+        print(f"分段日志目录不存在：{args.log_dir}")
+        sys.exit(1)
+    path = args.sqlite_file or default_path(args.log_dir)
+    if args.rebuild:
+        for p in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(p):
+                os.remove(p)
+
+    store = SqliteStore(path)
+    before = store.count()
+    n = store.import_records(visitorLog.open_log(args.log_dir, readonly=True).iter_records())
+    print(f"📦 导入 {n:,} 条新记录到 {path}（原有 {before:,} 条，现有 {store.count():,} 条）")
+
+
+if __name__ == "__main__":
+    main()
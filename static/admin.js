@@ -1,4 +1,14 @@
-fetch("/admin/api/top10")
+let account = new URLSearchParams(location.search).get("account")
+  || document.getElementById("account").value;
+document.getElementById("account").value = account;
+
+function switchAccount(key) {
+  const url = new URL(location.href);
+  url.searchParams.set("account", key);
+  location.href = url.toString();
+}
+
+fetch("/admin/api/top10?account=" + account)
   .then(r => r.json())
   .then(d => {
     let html = "<tr><th>昵称</th><th>UIN</th><th>次数</th></tr>";
@@ -8,22 +18,74 @@ fetch("/admin/api/top10")
     document.getElementById("top10").innerHTML = html;
   });
 
-fetch("/admin/api/unique_total")
+fetch("/admin/api/unique_total?account=" + account)
   .then(r => r.json())
   .then(d => {
     document.getElementById("unique").innerText =
       d.unique_users_total;
   });
 
-function queryUin() {
+fetch("/admin/api/scheduler")
+  .then(r => r.json())
+  .then(d => {
+    let html = "<tr><th>账号</th><th>间隔</th><th>下次等待</th><th>新增/分钟</th><th>重叠率</th><th>失败</th><th>最近决策</th></tr>";
+    Object.values(d.accounts || {}).forEach(s => {
+      const last = s.decisions.length ? s.decisions[s.decisions.length - 1].reason : "-";
+      const overlap = s.overlap === null ? "-" : s.overlap.toFixed(2);
+      html += `<tr><td>${s.nickname}</td><td>${s.interval}s</td><td>${s.delay}s</td><td>${s.rate_per_min}</td><td>${overlap}</td><td>${s.failures}</td><td>${last}</td></tr>`;
+    });
+    document.getElementById("scheduler").innerHTML = html;
+  });
+
+const LIVE_ROWS = 50;
+
+if (window.EventSource) {
+  const live = new EventSource("/api/stream?account=" + account);
+  const state = document.getElementById("liveState");
+  live.onopen = () => { state.innerText = "●"; };
+  live.onerror = () => { state.innerText = "（重连中）"; };
+  live.addEventListener("records", e => {
+    const d = JSON.parse(e.data);
+    const table = document.getElementById("live");
+    // 新的在上面，表头保留在第一行
+    d.records.forEach(r => {
+      const row = table.insertRow(1);
+      [r.time_str, r.name, r.uin, r.shuoshuo_id || ""].forEach(v => {
+        row.insertCell().innerText = v;
+      });
+    });
+    while (table.rows.length > LIVE_ROWS + 1) table.deleteRow(-1);
+  });
+}
+
+let uinCursor = null;
+
+function queryUin(more) {
   let u = document.getElementById("uin").value;
-  fetch("/admin/api/uin/" + u)
+  let url = "/admin/api/uin/" + u + "?account=" + account;
+  if (more && uinCursor) url += "&before=" + uinCursor;
+
+  fetch(url)
     .then(r => r.json())
     .then(d => {
-      let html = "<tr><th>时间</th><th>说说ID</th></tr>";
+      let html = more ? "" : "<tr><th>时间</th><th>说说ID</th></tr>";
       d.records.forEach(r => {
         html += `<tr><td>${r.time_human}</td><td>${r.shuoshuo_id || ""}</td></tr>`;
       });
-      document.getElementById("records").innerHTML = html;
+      let table = document.getElementById("records");
+      if (more) table.innerHTML += html;
+      else table.innerHTML = html;
+
+      uinCursor = d.next_before;
+      document.getElementById("uinCount").innerText = `共 ${d.count} 条`;
+      document.getElementById("uinMore").style.display = uinCursor ? "" : "none";
+    });
+}
+
+function triggerExport() {
+  fetch("/admin/api/export?account=" + account, { method: "POST" })
+    .then(r => r.json())
+    .then(d => {
+      document.getElementById("exportMsg").innerText = d.message;
     });
 }
@@ -0,0 +1,210 @@
+"""
+访客排行（Top-K）
+
+按天（与周报一致，以早上 6 点为界）维护每个访客的访问次数和当天最后使用的昵称，
+随新记录增量更新并保存在数据库旁边（<db>.daily.json）。
+任意按天对齐的区间合并对应的日计数即可得到精确 Top-K。
+
+保存由 indexSaver 在后台线程完成；每天一段 JSON 单独缓存，
+锁内只复制有改动的那几天（通常只有今天），不再每次序列化全部历史。
+
+区间很长、访客很多时可用近似模式：按天流式合并进 Space-Saving 摘要，
+内存只与摘要容量有关，结果附带每项计数的最大误差。
+"""
+
+import heapq
+import json
+import threading
+import time
+from collections import Counter
+
+import indexSaver
+
+DAY = 86400
+DAY_START_HOUR = 6
+
+
+def day_start(ts):
+    """ts 所在“天”（6:00 ~ 次日 6:00）的起点"""
+    lt = time.localtime(ts - DAY_START_HOUR * 3600)
+    return int(time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, DAY_START_HOUR, 0, 0, 0, 0, -1)))
+
+
+class SpaceSaving:
+    """Space-Saving 频繁项摘要，最多保留 capacity 个计数器"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}   # item -> count
+        self.errors = {}   # item -> 被替换时继承的计数（误差上界）
+        self._heap = []    # (count, item)，惰性删除
+
+    def _push(self, item):
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i) for i, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            c, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == c:
+                return item, c
+
+    def update(self, item, weight=1):
+        if item in self.counts:
+            self.counts[item] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+        else:
+            victim, c = self._pop_min()
+            del self.counts[victim]
+            del self.errors[victim]
+            self.counts[item] = c + weight
+            self.errors[item] = c
+        self._push(item)
+
+    def top(self, k):
+        items = sorted(self.counts.items(), key=lambda x: -x[1])[:k]
+        return [(item, c, self.errors[item]) for item, c in items]
+
+
+class DailyCounters:
+    def __init__(self, path, save_interval=60, readonly=False):
+        self.path = path
+        self.save_interval = save_interval
+        self.readonly = readonly  # 只读端（Web 进程）不写文件，由采集端保存
+
+        self._lock = threading.Lock()
+        self.days = {}    # day_ts -> Counter(uin)
+        self.names = {}   # day_ts -> {uin: name}
+        self.count = 0
+
+        self._changed = set()  # 上次保存后有改动的天
+        self._parts = {}       # day_ts -> 该天在文件中的 JSON 片段（只由保存线程读写）
+        self._saver = indexSaver.IndexSaver(
+            path, self._lock, self._snapshot, self._encode, save_interval, name="save-daily"
+        )
+
+    # ---------- 增量更新 ----------
+
+    def _add(self, records):
+        for r in records:
+            self.count += 1
+            uin = r.get("uin")
+            t = r.get("time")
+            if not uin or not t:
+                continue
+            d = day_start(t)
+            counter = self.days.get(d)
+            if counter is None:
+                counter = self.days[d] = Counter()
+                self.names[d] = {}
+            self._changed.add(d)
+            counter[uin] += 1
+            if r.get("name"):
+                self.names[d][uin] = r["name"]
+
+    def add(self, records):
+        """存储订阅回调"""
+        if not records:
+            return
+        with self._lock:
+            self._add(records)
+        if not self.readonly:
+            self._saver.mark_dirty()
+
+    def rebuild(self, records):
+        with self._lock:
+            self.days = {}
+            self.names = {}
+            self.count = 0
+            self._add(records)
+        self._saver.dirty = True
+        self.save()
+
+    # ---------- 持久化 ----------
+
+    def _snapshot(self):
+        """锁内调用：只复制有改动的天"""
+        changed = {d: (dict(self.days[d]), dict(self.names[d])) for d in self._changed}
+        self._changed = set()
+        return self.count, list(self.days), changed
+
+    def _encode(self, snap):
+        count, days, changed = snap
+        for d, (counter, names) in changed.items():
+            rows = [[uin, c, names.get(uin)] for uin, c in counter.items()]
+            self._parts[d] = json.dumps([d, rows], ensure_ascii=False)
+        if len(self._parts) > len(days):
+            # 重建后已不存在的天
+            keep = set(days)
+            self._parts = {d: p for d, p in self._parts.items() if d in keep}
+        # 与 json.dump({"count": ..., "days": [...]}) 的输出相同
+        return f'{{"count": {count}, "days": [' + ", ".join(self._parts[d] for d in days) + "]}"
+
+    def save(self):
+        if self.readonly:
+            return
+        self._saver.save()
+
+    def load(self):
+        """读取持久化的日计数，返回其覆盖的记录数；文件缺失或损坏返回 -1"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return -1
+
+        with self._lock:
+            self.days = {}
+            self.names = {}
+            for d, rows in data["days"]:
+                self.days[d] = Counter({uin: c for uin, c, _ in rows})
+                self.names[d] = {uin: name for uin, _, name in rows if name}
+            self.count = data["count"]
+            self._changed = set()
+            # 文件里每天的内容就是现成的片段，之后只需重新编码有改动的天
+            self._parts = {} if self.readonly else {
+                d: json.dumps([d, rows], ensure_ascii=False) for d, rows in data["days"]
+            }
+        return self.count
+
+    def sync(self, store):
+        """启动时与存储核对，条数对不上就全量重建"""
+        if self.load() != len(store):
+            print("♻️ 重建每日访客计数")
+            self.rebuild(store.iter_records())
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def aligned(start_ts, end_ts):
+        return day_start(start_ts) == start_ts and day_start(end_ts) == end_ts
+
+    def _days_in(self, start_ts, end_ts):
+        return sorted(d for d in self.days if start_ts <= d < end_ts)
+
+    def top(self, start_ts, end_ts, k):
+        """精确 Top-K：[(uin, name, visits)]"""
+        merged = Counter()
+        names = {}
+        with self._lock:
+            for d in self._days_in(start_ts, end_ts):
+                merged.update(self.days[d])
+                names.update(self.names[d])
+        return [(uin, names.get(uin), c) for uin, c in merged.most_common(k)]
+
+    def top_approx(self, start_ts, end_ts, k, capacity=1000):
+        """近似 Top-K：[(uin, name, visits, error)]，内存上限为 capacity 个计数器"""
+        summary = SpaceSaving(max(capacity, k))
+        names = {}
+        with self._lock:
+            for d in self._days_in(start_ts, end_ts):
+                for uin, c in self.days[d].items():
+                    summary.update(uin, c)
+                for uin, name in self.names[d].items():
+                    if uin in summary.counts:
+                        names[uin] = name
+        return [(uin, names.get(uin), c, err) for uin, c, err in summary.top(k)]
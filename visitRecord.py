@@ -0,0 +1,172 @@
+"""
+紧凑的访客记录
+
+内存存储里每条访客原本是 json.loads 出来的 12 键 dict，百万条时进程内存大半是 dict 本身的开销。
+Visit 用 __slots__ 保存同样的字段，对外仍是只读 Mapping（r["uin"]、r.get("name")、dict(r) 照常可用）：
+    time_str  不再保存，读取时由 time 现算（与 parse_visitor 的格式相同）；
+              只有与现算结果不一致（如旧数据在别的时区写入）或原记录没有该键时才单独记下
+    其余字段  字符串（昵称、说说 ID 等）sys.intern，整数（uin、src 等）经同一张表去重，
+              同一个值全进程只存一份；time 各不相同，原样保存
+未知字段放进 _extra，键的顺序与原记录一致（标准字段在前），输出的 JSON / Excel 不变。
+"""
+
+import sys
+import time
+from collections.abc import Mapping
+
+FIELDS = (
+    "time", "time_str", "uin", "name", "src", "platform_src",
+    "service_src", "hide_from", "is_hide_visit", "yellow", "supervip", "shuoshuo_id",
+)
+SLOTS = tuple(f for f in FIELDS if f != "time_str")
+_SLOT_SET = frozenset(SLOTS)
+_SHARED = _SLOT_SET - {"time"}
+
+_ABSENT = object()  # 原记录没有 time_str
+_NO_TIME_STR = {"time_str": _ABSENT}  # 只缺 time_str 的记录共用（_extra 只读）
+_INTS = {}
+_QUARTERS = {}  # 整 15 分钟的时间戳 -> ("YYYY-mm-dd HH:", 该刻钟起点在小时内的秒数)
+_MMSS = [f"{i // 60:02d}:{i % 60:02d}" for i in range(3600)]
+
+
+def format_time(t):
+    """time.strftime("%Y-%m-%d %H:%M:%S", localtime(t)) 的快速版
+
+    各地时区偏移和夏令时切换都是 15 分钟的整数倍，同一刻钟内只有分、秒不同，
+    日期和小时按刻钟缓存，加载百万条记录时不必每条都调用 strftime。
+    """
+    t = t or 0
+    if type(t) is not int:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+    offset = t % 900
+    quarter = _QUARTERS.get(t - offset)
+    if quarter is None:
+        tm = time.localtime(t - offset)
+        if tm.tm_sec or tm.tm_min % 15:
+            # 1900 年前后的地方平时等非整刻钟偏移，不走缓存
+            return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+        quarter = _QUARTERS[t - offset] = (time.strftime("%Y-%m-%d %H:", tm), tm.tm_min * 60)
+    return quarter[0] + _MMSS[quarter[1] + offset]
+
+
+def _share(v):
+    if type(v) is str:
+        return sys.intern(v)
+    if type(v) is int:
+        return _INTS.setdefault(v, v)
+    return v
+
+
+class Visit(Mapping):
+    __slots__ = SLOTS + ("_extra",)
+
+    def __init__(self, record):
+        self._extra = None
+        if tuple(record) == FIELDS:
+            # parse_visitor 写出的标准记录
+            self.time = record["time"]
+            self.uin = _share(record["uin"])
+            self.name = _share(record["name"])
+            self.src = _share(record["src"])
+            self.platform_src = _share(record["platform_src"])
+            self.service_src = record["service_src"]
+            self.hide_from = record["hide_from"]
+            self.is_hide_visit = record["is_hide_visit"]
+            self.yellow = record["yellow"]
+            self.supervip = record["supervip"]
+            self.shuoshuo_id = _share(record["shuoshuo_id"])
+        else:
+            extra = {}
+            for k, v in record.items():
+                if k in _SLOT_SET:
+                    setattr(self, k, _share(v) if k in _SHARED else v)
+                elif k != "time_str":
+                    extra[k] = v
+            self._extra = extra or None
+
+        time_str = record.get("time_str", _ABSENT)
+        if time_str is _ABSENT and self._extra is None:
+            self._extra = _NO_TIME_STR
+        elif time_str is _ABSENT or time_str != format_time(record.get("time")):
+            self._extra = dict(self._extra or {}, time_str=time_str)
+
+    @classmethod
+    def from_dict(cls, record):
+        return record if isinstance(record, cls) else cls(record)
+
+    # ---------- Mapping ----------
+
+    def __getitem__(self, key):
+        if key in _SLOT_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        extra = self._extra
+        if extra is not None and key in extra:
+            v = extra[key]
+            if v is _ABSENT:
+                raise KeyError(key)
+            return v
+        if key == "time_str":
+            return format_time(self.get("time"))
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _SLOT_SET:
+            return getattr(self, key, default)
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if key in _SLOT_SET:
+            return hasattr(self, key)
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        extra = self._extra
+        for k in FIELDS:
+            if k == "time_str":
+                if extra is None or extra.get("time_str") is not _ABSENT:
+                    yield k
+            elif hasattr(self, k):
+                yield k
+        if extra is not None:
+            for k, v in extra.items():
+                if k != "time_str":
+                    yield k
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        if self._extra is None:
+            try:
+                return {
+                    "time": self.time, "time_str": format_time(self.time),
+                    "uin": self.uin, "name": self.name,
+                    "src": self.src, "platform_src": self.platform_src,
+                    "service_src": self.service_src, "hide_from": self.hide_from,
+                    "is_hide_visit": self.is_hide_visit, "yellow": self.yellow,
+                    "supervip": self.supervip, "shuoshuo_id": self.shuoshuo_id,
+                }
+            except AttributeError:
+                pass
+        return {k: self[k] for k in self}
+
+    def __repr__(self):
+        return f"Visit({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return Visit, (self.to_dict(),)
+
+
+def as_dict(r):
+    """记录转成普通 dict（需要修改或 JSON 序列化时用）"""
+    return r.to_dict() if type(r) is Visit else dict(r)
@@ -0,0 +1,218 @@
+"""
+单个账号的数据集合
+
+每个被监控的 QQ 空间账号各自拥有一套：
+    分段日志 / 存储后端 / 小时汇总 / 首次访问索引 / 每日计数 / 报表缓存
+文件都放在该账号 db_file 的旁边，互不影响。
+
+config.json 中 accounts 为账号列表；没有 accounts 时沿用旧的 visitor + db_file 单账号配置。
+
+采集端与 Web 分进程部署时，采集端可写打开（唯一写入者，负责保存索引文件），
+Web 进程 readonly=True 打开，两者只通过磁盘上的文件交流：
+    <db>.notify         采集端每次写入后更新，Web 端据此增量读取新记录
+    <db>.collector.json 采集端的调度状态
+    <db>.export         Web 端请求导出 Excel，采集端处理后删除
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+import firstSeen
+import reportCache
+import rollup
+import topk
+import visitorLog
+import visitorStore
+
+
+def account_confs(config):
+    """把配置整理成账号列表：[{key, uin, nickname, db_file, interval, ...}]"""
+    defaults = config.get("visitor", {})
+    accounts = config.get("accounts")
+    if not accounts:
+        accounts = [dict(defaults, db_file=config["db_file"])]
+
+    result = []
+    for acc in accounts:
+        conf = dict(defaults, **acc)
+        conf["key"] = str(conf["UIN"])
+        conf.setdefault("db_file", f"qzone_visitor_db_{conf['nickname']}.json")
+        result.append(conf)
+
+    keys = [c["key"] for c in result]
+    if len(set(keys)) != len(keys):
+        raise ValueError("accounts 中存在重复的 UIN")
+    return result
+
+
+class VisitorData:
+    def __init__(self, conf, storage_conf, cache_conf, refresh_interval=15, readonly=False):
+        t0 = time.perf_counter()
+        self.key = conf["key"]
+        self.readonly = readonly
+        self.uin = conf["UIN"]
+        self.nickname = conf["nickname"]
+        self.db_file = conf["db_file"]
+        self.db_dir = os.path.splitext(self.db_file)[0]
+        self.notify_path = self.db_dir + ".notify"
+        self.status_path = self.db_dir + ".collector.json"
+        self.export_path = self.db_dir + ".export"
+
+        # 账号可单独覆盖 storage 配置（如各自的 sqlite_file）
+        storage_conf = dict(storage_conf, **conf.get("storage", {}))
+        segment_bytes = storage_conf.get("segment_mb", 8) * 1024 * 1024
+
+        self.log = visitorLog.open_log(
+            self.db_dir, legacy_json=self.db_file, segment_bytes=segment_bytes, readonly=readonly
+        )
+
+        #采集端 append，报表函数只读存储后端
+        self.store = visitorStore.open_store(storage_conf, self.log)
+
+        #小时汇总表：整点尺度的序列直接从汇总格子求和
+        self.rollup = rollup.HourlyRollup(self.db_dir + ".rollup.json", readonly=readonly)
+        self.rollup.sync(self.store)
+        self.store.subscribe(self.rollup.add)
+
+        #首次访问索引：新增访客只看首次出现时间
+        self.first_seen = firstSeen.FirstSeenIndex(self.db_dir + ".firstseen.json", readonly=readonly)
+        self.first_seen.sync(self.store)
+        self.store.subscribe(self.first_seen.add)
+
+        #每日访客计数：按天合并得到任意区间的 Top-K
+        self.daily = topk.DailyCounters(self.db_dir + ".daily.json", readonly=readonly)
+        self.daily.sync(self.store)
+        self.store.subscribe(self.daily.add)
+
+        #报表缓存：按数据版本失效，已结束的区间永久缓存并落盘（只读打开时不落盘）
+        store = self.store
+        self.cache = reportCache.ReportCache(
+            lambda: store.version,
+            lambda: store.newest_ts,
+            lambda: len(store),
+            capacity=cache_conf.get("capacity", 256),
+            ttl=cache_conf.get("ttl", refresh_interval),
+            path=self.db_dir + ".reportcache.json" if cache_conf.get("persist", True) else None,
+            readonly=readonly,
+        )
+        self.cache.load()
+        self.store.subscribe(self.cache.on_records)
+
+        #统计引擎：python 直接用存储后端，numpy 使用列式索引（需安装 numpy）
+        if storage_conf.get("engine", "python") == "numpy":
+            import columnar
+            self.engine = columnar.build(self.store.iter_records())
+            self.store.subscribe(self.engine.extend)
+        else:
+            self.engine = self.store
+
+        #数据版本（条件请求用）：日志只追加，已载入条数在各进程间一致，
+        #store.version 是进程内的批次计数，不同 Web 进程会不一样
+        self.revision = len(self.store)
+        self.modified = time.time()
+        self.store.subscribe(self._mark_changed)
+
+        if not readonly:
+            self.store.subscribe(self._notify)
+        self._watch_thread = None
+        self.load_seconds = time.perf_counter() - t0
+
+        atexit.register(self.save_indexes)
+
+    def save_indexes(self):
+        self.rollup.save()
+        self.first_seen.save()
+        self.daily.save()
+        self.cache.save()
+
+    def _mark_changed(self, records):
+        """存储订阅回调：放在各索引之后，保证 revision 变化时报表已能看到新数据"""
+        self.revision += len(records)
+        self.modified = time.time()
+
+    # ---------- 进程间通知 ----------
+
+    def _write_json(self, path, data):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _read_json(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _notify(self, records):
+        """存储订阅回调（采集端）：更新变更通知文件"""
+        self._write_json(self.notify_path, {
+            "time": time.time(),
+            "newest_ts": self.store.newest_ts,
+            "count": len(self.store),
+        })
+
+    def start_watch(self, interval=0.5, fallback=30):
+        """只读端：通知文件变化时读取新增记录，每 fallback 秒兜底检查一次"""
+        if self._watch_thread is not None:
+            return self._watch_thread
+
+        def mtime():
+            try:
+                return os.stat(self.notify_path).st_mtime_ns
+            except OSError:
+                return None
+
+        def loop():
+            seen = mtime()
+            last = time.time()
+            while True:
+                time.sleep(interval)
+                current = mtime()
+                if current == seen and time.time() - last < fallback:
+                    continue
+                seen, last = current, time.time()
+                try:
+                    added = self.store.refresh()
+                    if added:
+                        print(f"👀 {self.nickname} 新增 {added} 条记录")
+                except Exception as e:
+                    print(f"{self.nickname} 数据监视出错: {e}")
+
+        self._watch_thread = threading.Thread(target=loop, name=f"watch-{self.key}", daemon=True)
+        self._watch_thread.start()
+        return self._watch_thread
+
+    def write_status(self, status):
+        self._write_json(self.status_path, status)
+
+    def read_status(self):
+        return self._read_json(self.status_path)
+
+    def request_export(self):
+        """Web 端：请求采集端导出 Excel"""
+        self._write_json(self.export_path, {"time": time.time()})
+
+    def take_export_request(self):
+        """采集端：有导出请求时删除请求文件并返回 True"""
+        try:
+            os.remove(self.export_path)
+            return True
+        except OSError:
+            return False
+
+    # ---------- 查询 ----------
+
+    def series_counts(self, start_ts, bucket_seconds, n_buckets):
+        if self.rollup.covers(start_ts, bucket_seconds):
+            return self.rollup.bucket_counts(start_ts, bucket_seconds, n_buckets)
+        return self.engine.bucket_counts(start_ts, bucket_seconds, n_buckets)
+
+    def shuoshuo_series(self, start_ts, bucket_seconds, n_buckets):
+        if self.rollup.covers(start_ts, bucket_seconds):
+            return self.rollup.shuoshuo_bucket_counts(start_ts, bucket_seconds, n_buckets)
+        return self.engine.shuoshuo_bucket_counts(start_ts, bucket_seconds, n_buckets)
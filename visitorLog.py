@@ -0,0 +1,211 @@
+"""
+追加式分段访客日志
+
+目录结构：
+    qzone_visitor_db_xxx/
+        segment-000001.jsonl
+        segment-000002.jsonl
+        ...
+
+每行一条 JSON 记录，只追加不重写；单个分段超过大小上限后滚动到下一个分段。
+进程崩溃时最多留下最后一行不完整的数据，打开日志时会被截掉。
+只有一个进程（采集端）可写；其它进程用 readonly=True 打开，只读取完整的行。
+"""
+
+import json
+import os
+import sys
+import threading
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+DEFAULT_SEGMENT_BYTES = 8 * 1024 * 1024
+
+
+def segment_name(seq):
+    return f"{SEGMENT_PREFIX}{seq:06d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(log_dir):
+    """按序号返回所有分段文件路径"""
+    if not os.path.isdir(log_dir):
+        return []
+
+    names = [
+        n for n in os.listdir(log_dir)
+        if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)
+    ]
+    names.sort()
+    return [os.path.join(log_dir, n) for n in names]
+
+
+def _segment_seq(path):
+    name = os.path.basename(path)
+    return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+def _repair_tail(path):
+    """截掉崩溃时写了一半的最后一行"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+
+    with open(path, "rb+") as f:
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return 0
+
+        # 从尾部往前找最后一个换行
+        pos = size
+        chunk = 4096
+        keep = 0
+        while pos > 0:
+            step = min(chunk, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step)
+            idx = buf.rfind(b"\n")
+            if idx != -1:
+                keep = pos + idx + 1
+                break
+
+        f.truncate(keep)
+        f.flush()
+        os.fsync(f.fileno())
+        return size - keep
+
+
+def iter_segment(path):
+    """逐行读取单个分段，跳过损坏行"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                # 正在被写入的半行，下次再读
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class VisitorLog:
+    """分段追加日志，单进程内写入线程安全"""
+
+    def __init__(self, log_dir, segment_bytes=DEFAULT_SEGMENT_BYTES, readonly=False):
+        self.log_dir = log_dir
+        self.segment_bytes = segment_bytes
+        self.readonly = readonly
+        self._lock = threading.Lock()
+
+        # 只读端不能截尾：采集端可能正写到一半
+        if readonly:
+            return
+
+        os.makedirs(log_dir, exist_ok=True)
+
+        segments = list_segments(log_dir)
+        if segments:
+            _repair_tail(segments[-1])
+            self._seq = _segment_seq(segments[-1])
+        else:
+            self._seq = 1
+
+    @property
+    def current_segment(self):
+        return os.path.join(self.log_dir, segment_name(self._seq))
+
+    def segments(self):
+        return list_segments(self.log_dir)
+
+    def append(self, records):
+        """把新记录追加到当前分段，返回写入条数"""
+        if not records:
+            return 0
+        if self.readonly:
+            raise RuntimeError(f"日志以只读方式打开：{self.log_dir}")
+
+        data = "".join(
+            json.dumps(r, ensure_ascii=False) + "\n" for r in records
+        ).encode("utf-8")
+
+        with self._lock:
+            path = self.current_segment
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                self._seq += 1
+                path = self.current_segment
+
+            with open(path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+        return len(records)
+
+    def iter_records(self):
+        """按写入顺序流式读取全部记录"""
+        for path in self.segments():
+            yield from iter_segment(path)
+
+    def __iter__(self):
+        return self.iter_records()
+
+
+#旧 JSON 数组迁移
+
+def migrate_json(json_path, log_dir, segment_bytes=DEFAULT_SEGMENT_BYTES):
+    """
+    把旧版 JSON 数组数据库一次性迁移为分段日志
+    先写入临时目录再整体改名，迁移中断不会留下半个日志
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            data = []
+
+    if not isinstance(data, list):
+        data = []
+
+    data.sort(key=lambda r: r.get("time") or 0)
+
+    tmp_dir = log_dir.rstrip("/\\") + ".migrating"
+    if os.path.isdir(tmp_dir):
+        for p in list_segments(tmp_dir):
+            os.remove(p)
+
+    log = VisitorLog(tmp_dir, segment_bytes)
+    batch = 5000
+    for i in range(0, len(data), batch):
+        log.append(data[i:i + batch])
+
+    os.replace(tmp_dir, log_dir)
+    return len(data)
+
+
+def open_log(log_dir, legacy_json=None, segment_bytes=DEFAULT_SEGMENT_BYTES, readonly=False):
+    """打开日志；日志目录不存在且有旧 JSON 时先迁移（只读打开时由采集端负责迁移）"""
+    if readonly:
+        return VisitorLog(log_dir, segment_bytes, readonly=True)
+
+    if not os.path.isdir(log_dir) and legacy_json and os.path.exists(legacy_json):
+        n = migrate_json(legacy_json, log_dir, segment_bytes)
+        print(f"📦 已迁移 {n} 条旧记录：{legacy_json} -> {log_dir}")
+
+    return VisitorLog(log_dir, segment_bytes)
+
+
+if __name__ == "__main__":
+    # python visitorLog.py migrate <旧JSON> <日志目录>
+    if len(sys.argv) != 4 or sys.argv[1] != "migrate":
+        print("用法: python visitorLog.py migrate <qzone_visitor_db.json> <log_dir>")
+        sys.exit(1)
+
+    if os.path.exists(sys.argv[3]):
+        print(f"目标目录已存在：{sys.argv[3]}")
+        sys.exit(1)
+
+    count = migrate_json(sys.argv[2], sys.argv[3])
+    print(f"迁移完成，共 {count} 条")
@@ -0,0 +1,337 @@
+"""
+进程内共享访客存储
+
+采集端和 Web 端在同一进程时，采集端通过 append() 写入（先落盘到分段日志，再并入内存），
+所有报表函数都从这里读，不再反复解析数据库文件。
+
+只读端（单独运行的 weeklyReport.py、wsgi.py）没有采集端，由 visitorData 监视采集端写出的通知文件，
+有变化时调用 refresh() 只读取日志分段里新增的完整行。两种方式二选一，不要同时使用。
+
+存储后端由 config.json 的 storage.backend 选择：
+    memory  分段日志 + 内存索引（默认）
+    sqlite  SQLite（WAL），见 sqliteStore.py
+两者提供相同的查询接口，报表函数不关心具体后端。
+
+派生索引（小时汇总等）通过 subscribe() 注册，每批新记录并入后依次回调，
+无论记录来自采集端 append() 还是文件监视 refresh()。
+
+内存里的记录默认是 visitRecord.Visit（__slots__ + 字符串驻留，time_str 现算），
+同样按 Mapping 读取；storage.compact_records 设为 false 时保留原始 dict。
+"""
+
+import bisect
+import json
+import os
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import visitRecord
+
+
+class RWLock:
+    """读写锁：读并发，写独占，有写者等待时新读者让行"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def _as_is(r):
+    return r
+
+
+_MISSING = object()
+
+
+class VisitorStore:
+    def __init__(self, log, compact=True):
+        self.log = log
+        self._convert = visitRecord.Visit.from_dict if compact else _as_is
+        # 热点循环里按字段取值：Visit 用 getattr，dict 用 dict.get，
+        # 两者都是 C 实现、参数相同 (记录, 字段, 默认值)，比逐条调用 Python 层的 r.get 快
+        self._field = getattr if compact else dict.get
+        self.lock = RWLock()
+        self.version = 0
+
+        # 按时间升序排列，_times 与 _records 一一对应
+        self._records = []
+        self._times = []
+        self._uins = set()
+
+        # 每个访客的记录列表（倒排表）：str(uin) -> ([time 升序], [record])
+        self._postings = {}
+
+        # 文件监视：分段路径 -> 已读字节数
+        self._offsets = {}
+
+        self._listeners = []
+
+    def subscribe(self, fn):
+        """fn(records) 在每批新记录并入后调用"""
+        self._listeners.append(fn)
+
+    def _notify(self, records):
+        for fn in self._listeners:
+            fn(records)
+
+    # ---------- 写入 ----------
+
+    def _insert(self, records):
+        get = self._field
+        for r in records:
+            t = get(r, "time", None) or 0
+            uin = get(r, "uin", _MISSING)
+            i = bisect.bisect_right(self._times, t)
+            self._times.insert(i, t)
+            self._records.insert(i, r)
+            if uin is _MISSING:
+                uin = None
+            else:
+                self._uins.add(uin)
+
+            times, recs = self._postings.setdefault(str(uin), ([], []))
+            j = bisect.bisect_right(times, t)
+            times.insert(j, t)
+            recs.insert(j, r)
+
+    def _reset(self, records):
+        """用已按时间排序的记录重建全部内存索引"""
+        get = self._field
+        self._records = records
+        self._times = [get(r, "time", None) or 0 for r in records]
+        self._uins = {get(r, "uin", _MISSING) for r in records}
+        self._uins.discard(_MISSING)
+
+        self._postings = {}
+        for r, t in zip(records, self._times):
+            times, recs = self._postings.setdefault(str(get(r, "uin", None)), ([], []))
+            times.append(t)
+            recs.append(r)
+
+    def _add(self, records):
+        if not records:
+            return self.version
+        with self.lock.write():
+            self._insert(records)
+            self.version += 1
+        self._notify(records)
+        return self.version
+
+    def append(self, records):
+        """落盘并追加新记录，返回新的数据版本号"""
+        if not records:
+            return self.version
+        self.log.append(records)
+        return self._add([self._convert(r) for r in records])
+
+    @classmethod
+    def from_records(cls, records, log=None, compact=True):
+        """直接由记录构建（离线工具 / 基准测试用），不读日志"""
+        store = cls(log, compact)
+        get = store._field
+        store._reset(sorted(map(store._convert, records), key=lambda r: get(r, "time", None) or 0))
+        store.version = 1
+        return store
+
+    def load(self):
+        """启动时全量加载"""
+        get = self._field
+        records = self._read_new()
+        records.sort(key=lambda r: get(r, "time", None) or 0)
+        with self.lock.write():
+            self._reset(records)
+            self.version += 1
+        return len(records)
+
+    # ---------- 文件监视 ----------
+
+    def _read_new(self):
+        """读取各分段自上次以来新增的完整行"""
+        new = []
+        convert = self._convert
+        for path in self.log.segments():
+            offset = self._offsets.get(path, 0)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if size <= offset:
+                continue
+
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                continue
+
+            for line in data[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    new.append(convert(json.loads(line)))
+                except json.JSONDecodeError:
+                    continue
+
+            self._offsets[path] = offset + end
+        return new
+
+    def refresh(self):
+        """把日志中的新增记录并入内存，返回新增条数"""
+        new = self._read_new()
+        self._add(new)
+        return len(new)
+
+    # ---------- 读取 ----------
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def newest_ts(self):
+        return self._times[-1] if self._times else 0
+
+    def snapshot(self):
+        with self.lock.read():
+            return list(self._records)
+
+    def iter_records(self):
+        return iter(self.snapshot())
+
+    def _slice(self, start_ts, end_ts):
+        lo = bisect.bisect_left(self._times, start_ts)
+        hi = bisect.bisect_left(self._times, end_ts)
+        return lo, hi
+
+    def range(self, start_ts, end_ts):
+        """时间在 [start_ts, end_ts) 内的记录"""
+        with self.lock.read():
+            lo, hi = self._slice(start_ts, end_ts)
+            return self._records[lo:hi]
+
+    def range_counts(self, start_ts, end_ts):
+        """(访问次数, 独立访客)"""
+        get = self._field
+        data = self.range(start_ts, end_ts)
+        uins = {get(r, "uin", _MISSING) for r in data}
+        uins.discard(_MISSING)
+        return len(data), len(uins)
+
+    def bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        values = [0] * n_buckets
+        end_ts = start_ts + bucket_seconds * n_buckets
+        with self.lock.read():
+            lo, hi = self._slice(start_ts, end_ts)
+            for t in self._times[lo:hi]:
+                if t:
+                    values[(t - start_ts) // bucket_seconds] += 1
+        return values
+
+    def shuoshuo_bucket_counts(self, start_ts, bucket_seconds, n_buckets):
+        result = defaultdict(lambda: [0] * n_buckets)
+        end_ts = start_ts + bucket_seconds * n_buckets
+        get = self._field
+        with self.lock.read():
+            lo, hi = self._slice(start_ts, end_ts)
+            for r in self._records[lo:hi]:
+                sid = get(r, "shuoshuo_id", None)
+                t = get(r, "time", None)
+                if not sid or not t:
+                    continue
+                result[sid][(t - start_ts) // bucket_seconds] += 1
+        return result
+
+    def top_users(self, start_ts, end_ts, k):
+        """[(uin, name, visits)]，name 取区间内最后一次出现的昵称"""
+        counter = Counter()
+        name_map = {}
+        get = self._field
+        for r in self.range(start_ts, end_ts):
+            uin = get(r, "uin", None)
+            if not uin:
+                continue
+            counter[uin] += 1
+            name = get(r, "name", None)
+            if name:
+                name_map[uin] = name
+
+        return [
+            (uin, name_map.get(uin), cnt)
+            for uin, cnt in counter.most_common(k)
+        ]
+
+    def unique_total(self):
+        return len(self._uins)
+
+    def count_uin(self, uin):
+        with self.lock.read():
+            posting = self._postings.get(str(uin))
+            return len(posting[0]) if posting else 0
+
+    def uin_records(self, uin, limit, before=None):
+        """按时间倒序返回某个 uin 的记录；before 为游标，只取更早的记录"""
+        with self.lock.read():
+            posting = self._postings.get(str(uin))
+            if not posting:
+                return []
+            times, recs = posting
+            hi = len(times) if before is None else bisect.bisect_left(times, before)
+            lo = max(0, hi - limit)
+            return recs[lo:hi][::-1]
+
+
+def open_store(storage_conf, log):
+    """按配置创建存储后端（log 只读时不做导入，由采集端负责）"""
+    backend = storage_conf.get("backend", "memory")
+
+    if backend == "sqlite":
+        import sqliteStore
+        path = storage_conf.get("sqlite_file") or sqliteStore.default_path(log.log_dir)
+        # 日志仍是数据来源：采集端 append 先写日志再插入数据库；
+        # 只在数据库为空时自动导入，之后日志被替换需手动重新导入（见 sqliteStore.py）
+        store = sqliteStore.SqliteStore(path, log)
+        if not log.readonly and store.count() == 0 and log.segments():
+            n = store.import_records(log.iter_records())
+            print(f"📦 已从分段日志导入 {n} 条记录到 {path}")
+            store.seek_latest()
+        return store
+
+    if backend != "memory":
+        raise ValueError(f"未知存储后端: {backend}")
+
+    store = VisitorStore(log, compact=storage_conf.get("compact_records", True))
+    store.load()
+    return store
@@ -1,13 +1,23 @@
 import json
 import datetime
+import hashlib
 import time
-from collections import defaultdict, Counter, deque
 import os
 import sys
 import threading
 from functools import wraps
-from flask import render_template, request, redirect, url_for
-from flask import Flask, Response, jsonify, request, abort, session
+from flask import render_template, request, redirect
+from flask import Flask, Response, jsonify, request, abort, session, g, make_response
+from werkzeug.http import is_resource_modified
+import visitorData
+import accessLog
+import rateLimit
+import liveFeed
+import httpCompress
+import downsample
+import metrics
+import sampler
+import visitRecord
 
 def load_config(path="config.json"):
     with open(path, "r", encoding="utf-8") as f:
@@ -16,14 +26,42 @@ def load_config(path="config.json"):
 CONFIG = load_config()
 
 # ================= 配置 =================
-DB_FILE = CONFIG["db_file"]
+STORAGE_CONF = CONFIG.get("storage", {})
+CACHE_CONF = CONFIG.get("cache", {})
+LIVE_CONF = CONFIG.get("live", {})
+HTTP_CONF = CONFIG.get("http", {})
+
+#指标：/admin/api/metrics（Prometheus 文本格式）
+METRICS_CONF = CONFIG.get("metrics", {})
+PROFILE_ENABLED = METRICS_CONF.get("profile", False)  # 允许管理员用 ?profile=1 对单个请求采样
+PROFILE_INTERVAL = METRICS_CONF.get("profile_interval_ms", 1) / 1000
+
+METRICS = metrics.Registry()
+METRICS.describe("qzone_http_request_seconds", "histogram", "请求耗时（按路由）")
+METRICS.describe("qzone_http_requests_total", "counter", "请求数（按路由和状态码）")
+METRICS.describe("qzone_report_seconds", "histogram", "报表函数耗时（不含缓存命中）")
+METRICS.describe("qzone_collector_stage_seconds", "histogram", "采集各阶段耗时")
+METRICS.describe("qzone_collector_polls_total", "counter", "采集次数（按结果）")
+METRICS.describe("qzone_collector_records_added_total", "counter", "采集新增记录数")
+
+#自定义报表的上限：单次请求的耗时只取决于这些上限，与传入的参数无关
+REPORT_CONF = CONFIG.get("report", {})
+REPORT_MAX_POINTS = REPORT_CONF.get("max_points", 2000)  # 返回的点数（也是 max_points 的默认值）
+REPORT_MAX_BUCKETS = REPORT_CONF.get("max_buckets", 50000)  # lttb 需要先算出的原始桶数
+REPORT_MAX_RANGE_DAYS = REPORT_CONF.get("max_range_days", 731)
+REPORT_MAX_UIN_RECORDS = REPORT_CONF.get("max_uin_records", 1000)  # /admin/api/uin 每页条数
+REPORT_MAX_TOP_K = REPORT_CONF.get("max_top_k", 1000)  # /admin/api/top 的 k
 LOG_FILE = CONFIG["log_file"]
+ACCESS_LOG_CONF = CONFIG.get("access_log", {})
 
-QOS_LIMIT = CONFIG["qos"]["limit"]
-QOS_WINDOW = CONFIG["qos"]["window"]
+QOS_CONF = CONFIG["qos"]
+QOS_LIMIT = QOS_CONF["limit"]
+QOS_WINDOW = QOS_CONF["window"]
 
 PORT = CONFIG["server"]["port"]
 REFRESH_INTERVAL = CONFIG["server"]["refresh_interval"]
+# 分进程模式下 Web 跑在 gunicorn 等 worker 里，execv 会重新执行服务器主进程，不能从这里重启
+RESTART_ENABLED = CONFIG["server"].get("mode", "single") != "split"
 
 ADMIN_TOKEN = CONFIG["admin"]["token"]
 ADMIN_IPS = set(CONFIG["admin"]["ips"])
@@ -31,13 +69,22 @@ ADMIN_IPS = set(CONFIG["admin"]["ips"])
 SECRET_KEY = CONFIG["admin"]["secret_key"]
 # =======================================
 
-#周报缓存
-REPORT_CACHE = None
-REPORT_TS = 0
+#Excel 导出触发器（由采集端按账号注册）
+EXPORT_TRIGGERS = {}
+
+def register_export_trigger(account, fn):
+    EXPORT_TRIGGERS[str(account)] = fn
+
+#采集调度状态（由采集端按账号注册）
+COLLECTOR_STATUS = {}
+
+def register_collector_status(account, fn):
+    COLLECTOR_STATUS[str(account)] = fn
 
 #重启函数
 def restart_self():
     time.sleep(1)  # 给 HTTP 响应留时间
+    save_indexes()  # execv 不会执行 atexit
     python = sys.executable
     os.execv(python, [python] + sys.argv)
 
@@ -55,38 +102,69 @@ def admin_required(view_func):
         return view_func(*args, **kwargs)
     return wrapper
 
-def build_time_series(records, start_ts, end_ts, bucket_seconds):
+#条件请求：ETag 由账号、数据版本、本周起点和请求参数决定，没变就 304，不再生成报表
+def conditional(view_func):
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        data = request_account()
+        etag = hashlib.blake2b(
+            f"{data.key}|{data.revision}|{week_range(0)[0]}|{request.full_path}".encode(),
+            digest_size=12,
+        ).hexdigest()
+        modified = datetime.datetime.fromtimestamp(int(data.modified), datetime.timezone.utc)
+
+        if is_resource_modified(request.environ, etag=etag, last_modified=modified):
+            response = make_response(view_func(*args, **kwargs))
+        else:
+            response = Response(status=304)
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = modified
+        response.cache_control.no_cache = True
+        if request.path.startswith("/admin"):
+            response.cache_control.private = True
+        return response
+    return wrapper
+
+@METRICS.timed("qzone_report_seconds", builder="time_series")
+def build_time_series(start_ts, end_ts, bucket_seconds, account=None):
     """
-    通用时间序列生成器
+    通用时间序列生成器（计数由存储后端完成）
     """
     if end_ts <= start_ts:
         return [], []
 
     total_buckets = int((end_ts - start_ts) // bucket_seconds)
-    values = [0] * total_buckets
-    labels = []
+    values = series_counts(start_ts, bucket_seconds, total_buckets, account)
+    labels = bucket_labels(start_ts, bucket_seconds, range(total_buckets))
 
-    start = datetime.datetime.fromtimestamp(start_ts)
-
-    for i in range(total_buckets):
-        t = start + datetime.timedelta(seconds=i * bucket_seconds)
+    return labels, values
 
-        # label 自适应显示
-        if bucket_seconds >= 3600:
-            labels.append(t.strftime("%m-%d %H:%M"))
-        else:
-            labels.append(t.strftime("%H:%M"))
+def bucket_labels(start_ts, bucket_seconds, indexes, fmt=None):
+    """只给要返回的桶生成标签"""
+    start = datetime.datetime.fromtimestamp(start_ts)
 
-    for r in records:
-        ts = r.get("time")
-        if not ts:
-            continue
+    # label 自适应显示
+    if fmt is None:
+        fmt = "%m-%d %H:%M" if bucket_seconds >= 3600 else "%H:%M"
 
-        idx = (ts - start_ts) // bucket_seconds
-        if 0 <= idx < total_buckets:
-            values[int(idx)] += 1
+    return [
+        (start + datetime.timedelta(seconds=i * bucket_seconds)).strftime(fmt)
+        for i in indexes
+    ]
 
-    return labels, values
+def merged_counts(count_fn, start_ts, bucket_seconds, n_raw, factor):
+    """
+    每 factor 个原始桶合并成一个，直接按合并后的粒度统计；
+    末尾不足 factor 的部分单独成桶，总数与原始序列一致
+    """
+    merged = bucket_seconds * factor
+    n_full = n_raw // factor
+    values = list(count_fn(start_ts, merged, n_full)) if n_full else []
+    rest = n_raw - n_full * factor
+    if rest:
+        values += count_fn(start_ts + n_full * merged, rest * bucket_seconds, 1)
+    return values
 
 #时间工具
 def week_start_6am(ref=None):
@@ -94,70 +172,145 @@ def week_start_6am(ref=None):
     monday = now - datetime.timedelta(days=now.weekday())
     return monday.replace(hour=6, minute=0, second=0, microsecond=0)
 
-
-#数据加载
-def load_data():
-    with open(DB_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+def week_label(start):
+    return f"{start.year}-W{start.isocalendar()[1]}"
+
+
+#数据加载：每个账号一套存储和索引，采集端 append，报表函数只读
+ACCOUNT_CONFS = visitorData.account_confs(CONFIG)
+ACCOUNTS = {}
+DEFAULT_ACCOUNT = ACCOUNT_CONFS[0]["key"]
+_ACCOUNTS_LOCK = threading.Lock()
+
+#实时推送：每个账号一个 SSE 广播
+LIVE_FEEDS = {}
+LIVE_BUCKET = 900  # 推送序列增量的粒度，页面上的各时间尺度都是它的整数倍
+LIVE_MAX_RECORDS = 200  # 单个事件最多推送的记录条数（补抓时可能一次很多）
+
+def make_live_listener(data, feed):
+    """存储订阅回调：把新记录和本周序列的增量推给 /api/stream"""
+    def on_records(records):
+        if not len(feed):
+            return
+
+        start_ts, end_ts = week_range(0)
+        deltas = {}
+        for r in records:
+            t = r.get("time") or 0
+            if not start_ts <= t < end_ts:
+                continue
+            i = (t - start_ts) // LIVE_BUCKET
+            d = deltas.setdefault(i, [i, 0, 0])
+            d[1] += 1
+            # 首次访问索引先于本回调更新
+            if data.first_seen.first_seen(r.get("uin")) == t:
+                d[2] += 1
+
+        version = data.store.version
+        if deltas:
+            total_visits, unique_visitors = data.engine.range_counts(start_ts, end_ts)
+            feed.publish("series", {
+                "start": start_ts,
+                "bucket_seconds": LIVE_BUCKET,
+                "deltas": sorted(deltas.values()),
+                "summary": {
+                    "total_visits": total_visits,
+                    "unique_visitors": unique_visitors,
+                    "new_visitors": data.first_seen.count_new(start_ts, end_ts),
+                },
+            }, event_id=version)
+
+        # 访客明细只推给管理员
+        feed.publish("records", {
+            "count": len(records),
+            "records": [
+                {k: r.get(k) for k in ("time", "time_str", "uin", "name", "shuoshuo_id")}
+                for r in records[-LIVE_MAX_RECORDS:]
+            ],
+        }, event_id=version, admin_only=True)
+
+    return on_records
+
+def open_accounts(readonly=True):
+    """
+    打开各账号的数据（只打开一次）
+    采集端 readonly=False：唯一写入者，负责迁移旧数据和保存索引文件
+    单独运行的 Web 进程只读打开，再用 start_watchers() 跟进采集端的写入
+    """
+    with _ACCOUNTS_LOCK:
+        if not ACCOUNTS:
+            for conf in ACCOUNT_CONFS:
+                data = visitorData.VisitorData(
+                    conf, STORAGE_CONF, CACHE_CONF, REFRESH_INTERVAL, readonly=readonly
+                )
+                feed = liveFeed.LiveFeed(
+                    max_clients=LIVE_CONF.get("max_clients", 100),
+                    heartbeat=LIVE_CONF.get("heartbeat", 15),
+                )
+                data.store.subscribe(make_live_listener(data, feed))
+                LIVE_FEEDS[conf["key"]] = feed
+                ACCOUNTS[conf["key"]] = data
+        elif not readonly and any(d.readonly for d in ACCOUNTS.values()):
+            raise RuntimeError("数据已以只读方式打开，不能再作为采集端写入")
+    return ACCOUNTS
+
+def start_watchers():
+    for data in open_accounts().values():
+        data.start_watch()
+
+def get_data(account=None):
+    """account 为 UIN 字符串，缺省为配置中的第一个账号"""
+    data = open_accounts().get(str(account) if account else DEFAULT_ACCOUNT)
+    if data is None:
+        abort(404, "未知账号")
+    return data
+
+def request_account():
+    return get_data(request.args.get("account"))
+
+def account_list():
+    return [{"key": d.key, "nickname": d.nickname} for d in open_accounts().values()]
+
+def save_indexes():
+    for data in ACCOUNTS.values():
+        data.save_indexes()
+
+def series_counts(start_ts, bucket_seconds, n_buckets, account=None):
+    return get_data(account).series_counts(start_ts, bucket_seconds, n_buckets)
 
 
 #连续 168 小时
-def build_168h_series(records, start_ts):
-    values = [0] * 168
+@METRICS.timed("qzone_report_seconds", builder="168h_series")
+def build_168h_series(start_ts, account=None):
     labels = []
     start = datetime.datetime.fromtimestamp(start_ts)
 
     for i in range(168):
         labels.append((start + datetime.timedelta(hours=i)).strftime("%a %H"))
 
-    for r in records:
-        t = r.get("time")
-        if not t:
-            continue
-        idx = (t - start_ts) // 3600
-        if 0 <= idx < 168:
-            values[int(idx)] += 1
+    values = series_counts(start_ts, 3600, 168, account)
 
     return labels, values
 
 
 #每条说说的小时序列
-def build_shuoshuo_series(records, start_ts):
-    result = defaultdict(lambda: [0] * 168)
-
-    for r in records:
-        sid = r.get("shuoshuo_id")
-        t = r.get("time")
-        if not sid or not t:
-            continue
-
-        idx = (t - start_ts) // 3600
-        if 0 <= idx < 168:
-            result[sid][int(idx)] += 1
-
-    return result
-
-def generate_weekly_report_full(week_offset: int = 0):
-    all_data = load_data()
+@METRICS.timed("qzone_report_seconds", builder="shuoshuo_series")
+def build_shuoshuo_series(start_ts, account=None):
+    return get_data(account).shuoshuo_series(start_ts, 3600, 168)
 
+@METRICS.timed("qzone_report_seconds", builder="weekly_full")
+def generate_weekly_report_full(week_offset: int = 0, account=None):
+    data = get_data(account)
     start = week_start_6am() + datetime.timedelta(weeks=week_offset)
     end = start + datetime.timedelta(days=7)
     start_ts = int(start.timestamp())
 
-    week_data = [
-        r for r in all_data
-        if start_ts <= r.get("time", 0) < int(end.timestamp())
-    ]
-
-    week_uins = {r["uin"] for r in week_data if "uin" in r}
-    old_uins = {
-        r["uin"]
-        for r in all_data
-        if r.get("time", 0) < start_ts and "uin" in r
-    }
+    total_visits, unique_visitors = data.engine.range_counts(start_ts, int(end.timestamp()))
+    new_visitors = data.first_seen.count_new(start_ts, int(end.timestamp()))
 
-    labels, total_series = build_168h_series(week_data, start_ts)
-    shuoshuo_series = build_shuoshuo_series(week_data, start_ts)
+    labels, total_series = build_168h_series(start_ts, account)
+    new_series = data.first_seen.bucket_counts(start_ts, 3600, 168)
+    shuoshuo_series = build_shuoshuo_series(start_ts, account)
 
     shuoshuo_total = {
         sid: sum(series)
@@ -179,28 +332,38 @@ def generate_weekly_report_full(week_offset: int = 0):
 
     return {
         "generated_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "week": f"{start.year}-W{start.isocalendar()[1]}",
+        "week": week_label(start),
         "summary": {
-            "total_visits": len(week_data),
-            "unique_visitors": len(week_uins),
-            "new_visitors": len(week_uins - old_uins),
+            "total_visits": total_visits,
+            "unique_visitors": unique_visitors,
+            "new_visitors": new_visitors,
         },
         "hourly_168": {
             "start": start.strftime("%Y-%m-%d %H:%M"),
             "labels": labels,
             "values": total_series,
+            "new_values": new_series,
         },
         "shuoshuo": filtered_sorted_shuoshuo,
     }
 
 #周报生成
+@METRICS.timed("qzone_report_seconds", builder="weekly")
 def generate_weekly_report(
     week_offset: int = 0,
     start_ts: int | None = None,
     end_ts: int | None = None,
-    bucket_seconds: int = 3600
+    bucket_seconds: int = 3600,
+    account=None,
+    max_points=None,
+    mode="sum"
 ):
-    all_data = load_data()
+    """
+    max_points 不为空且桶数超过它时降采样：
+        sum   合并相邻的桶（bucket_seconds 变为合并后的粒度）
+        lttb  按访问次数挑选保持形状的点
+    """
+    data = get_data(account)
 
     # ===== 时间范围 =====
     if start_ts is None or end_ts is None:
@@ -209,28 +372,45 @@ def generate_weekly_report(
         start_ts = int(start.timestamp())
         end_ts = int(end.timestamp())
 
-    # ===== 数据筛选 =====
-    data = [
-        r for r in all_data
-        if start_ts <= r.get("time", 0) < end_ts
-    ]
-
     # ===== 用户统计 =====
-    uins = {r["uin"] for r in data if "uin" in r}
-    old_uins = {
-        r["uin"] for r in all_data
-        if r.get("time", 0) < start_ts and "uin" in r
-    }
+    total_visits, unique_visitors = data.engine.range_counts(start_ts, end_ts)
+    new_visitors = data.first_seen.count_new(start_ts, end_ts)
 
     # ===== 时间曲线 =====
-    labels, values = build_time_series(
-        data,
-        start_ts,
-        end_ts,
-        bucket_seconds
-    )
+    n_raw = max(int((end_ts - start_ts) // bucket_seconds), 0)
+    downsampled = None
+
+    if max_points and n_raw > max_points and mode == "lttb":
+        raw = series_counts(start_ts, bucket_seconds, n_raw, account)
+        raw_new = data.first_seen.bucket_counts(start_ts, bucket_seconds, n_raw)
+        indexes = downsample.lttb(raw, max_points)
+        # 点的间隔不再均匀，标签都带上日期
+        labels = bucket_labels(start_ts, bucket_seconds, indexes, "%m-%d %H:%M")
+        values = [raw[i] for i in indexes]
+        new_values = [raw_new[i] for i in indexes]
+        downsampled = {"mode": "lttb", "raw_points": n_raw, "points": len(values)}
+
+    elif max_points and n_raw > max_points:
+        factor = downsample.sum_factor(n_raw, max_points)
+        values = merged_counts(
+            lambda s, b, n: series_counts(s, b, n, account),
+            start_ts, bucket_seconds, n_raw, factor
+        )
+        new_values = merged_counts(data.first_seen.bucket_counts, start_ts, bucket_seconds, n_raw, factor)
+        bucket_seconds *= factor
+        labels = bucket_labels(start_ts, bucket_seconds, range(len(values)))
+        downsampled = {"mode": "sum", "factor": factor, "raw_points": n_raw, "points": len(values)}
 
-    return {
+    else:
+        labels, values = build_time_series(
+            start_ts,
+            end_ts,
+            bucket_seconds,
+            account
+        )
+        new_values = data.first_seen.bucket_counts(start_ts, bucket_seconds, len(values))
+
+    report = {
         "generated_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "time_range": {
             "start": datetime.datetime.fromtimestamp(start_ts).strftime("%Y-%m-%d %H:%M"),
@@ -238,98 +418,124 @@ def generate_weekly_report(
             "bucket_seconds": bucket_seconds
         },
         "summary": {
-            "total_visits": len(data),
-            "unique_visitors": len(uins),
-            "new_visitors": len(uins - old_uins),
+            "total_visits": total_visits,
+            "unique_visitors": unique_visitors,
+            "new_visitors": new_visitors,
         },
         "series": {
             "labels": labels,
-            "values": values
+            "values": values,
+            "new_values": new_values
         }
     }
+    if downsampled:
+        report["downsample"] = downsampled
+    return report
 
 
 
 #刷新页面
 
-def get_report_cached():
-    global REPORT_CACHE, REPORT_TS
-    now = time.time()
-
-    if REPORT_CACHE is None or now - REPORT_TS >= REFRESH_INTERVAL:
-        print("♻️ 刷新【当前周】访客周报数据")
-        REPORT_CACHE = generate_weekly_report(0)
-        REPORT_TS = now
-
-    return REPORT_CACHE
-
-#本周数据
-
-def get_week_data():
-    all_data = load_data()
-    start = week_start_6am()
+def week_range(week_offset=0):
+    start = week_start_6am() + datetime.timedelta(weeks=week_offset)
     end = start + datetime.timedelta(days=7)
-    start_ts = int(start.timestamp())
+    return int(start.timestamp()), int(end.timestamp())
 
-    return [
-        r for r in all_data
-        if start_ts <= r.get("time", 0) < end.timestamp()
-    ]
+def get_report_cached(account=None):
+    data = get_data(account)
+    start_ts, end_ts = week_range(0)
 
-#本周top10
+    # 未命中次数见 /admin/api/metrics 的 qzone_report_cache_misses_total
+    return data.cache.get(
+        ("report", start_ts, end_ts, 3600),
+        end_ts,
+        lambda: generate_weekly_report(0, account=data.key)
+    )
 
-def get_week_top10_users():
-    week_data = get_week_data()
+def get_full_report_cached(week_offset=0, account=None):
+    data = get_data(account)
+    start_ts, end_ts = week_range(week_offset)
+    return data.cache.get(
+        ("full", start_ts, end_ts),
+        end_ts,
+        lambda: generate_weekly_report_full(week_offset, data.key)
+    )
 
-    counter = Counter()
-    name_map = {}
+def get_custom_report_cached(start_ts, end_ts, bucket_seconds, account=None,
+                             max_points=REPORT_MAX_POINTS, mode="sum"):
+    data = get_data(account)
+    return data.cache.get(
+        ("custom", start_ts, end_ts, bucket_seconds, max_points, mode),
+        end_ts,
+        lambda: generate_weekly_report(
+            start_ts=start_ts,
+            end_ts=end_ts,
+            bucket_seconds=bucket_seconds,
+            account=data.key,
+            max_points=max_points,
+            mode=mode
+        )
+    )
 
-    for r in week_data:
-        uin = r.get("uin")
-        if not uin:
-            continue
+#本周top10
 
-        counter[uin] += 1
+@METRICS.timed("qzone_report_seconds", builder="top_users")
+def get_top_users(start_ts, end_ts, k=10, approx=False, account=None):
+    """
+    按天对齐的区间合并每日计数，否则交给存储后端统计
+    approx=True 使用 Space-Saving 近似（仅按天对齐的区间）
+    """
+    data = get_data(account)
+    result = []
 
+    if approx:
         # 直接使用原始 JSON 里的 name
-        if r.get("name"):
-            name_map[uin] = r["name"]
+        for uin, name, cnt, err in data.daily.top_approx(start_ts, end_ts, k):
+            result.append({
+                "uin": uin,
+                "name": name or "未知",
+                "visits": cnt,
+                "error": err
+            })
+        return result
+
+    if data.daily.aligned(start_ts, end_ts):
+        rows = data.daily.top(start_ts, end_ts, k)
+    else:
+        rows = data.store.top_users(start_ts, end_ts, k)
 
-    result = []
-    for uin, cnt in counter.most_common(10):
+    for uin, name, cnt in rows:
         result.append({
             "uin": uin,
-            "name": name_map.get(uin, "未知"),
+            "name": name or "未知",
             "visits": cnt
         })
 
     return result
 
+def get_week_top10_users(account=None):
+    return get_top_users(*week_range(0), 10, account=account)
+
 
 #全量独立用户
 
-def get_total_unique_users():
-    all_data = load_data()
-    return len({r["uin"] for r in all_data if "uin" in r})
+@METRICS.timed("qzone_report_seconds", builder="unique_total")
+def get_total_unique_users(account=None):
+    return get_data(account).store.unique_total()
 
 #查询uin
 
-def query_uin_records(uin, limit=200):
-    uin = str(uin)
-    all_data = load_data()
-
+@METRICS.timed("qzone_report_seconds", builder="query_uin")
+def query_uin_records(uin, limit=200, before=None, account=None):
     records = []
-    for r in all_data:
-        if str(r.get("uin")) != uin:
-            continue
-
-        item = dict(r)
+    for r in get_data(account).store.uin_records(uin, limit, before):
+        item = visitRecord.as_dict(r)
 
-        ts = r.get("time", 0)
+        ts = item.get("time", 0)
 
         # ✅ 优先使用原始 time_str
-        if r.get("time_str"):
-            item["time_human"] = r["time_str"]
+        if item.get("time_str"):
+            item["time_human"] = item["time_str"]
         elif ts:
             item["time_human"] = datetime.datetime.fromtimestamp(
                 ts
@@ -339,17 +545,16 @@ def query_uin_records(uin, limit=200):
 
         records.append(item)
 
-    records.sort(key=lambda x: x.get("time", 0), reverse=True)
-    return records[:limit]
+    return records
 
 #前序周报
-def get_week_report(week_offset: int):
+def get_week_report(week_offset: int, account=None):
     """
     week_offset = 0   当前周
     week_offset = -1  上一周
     """
     # 你原来的数据生成逻辑
-    report = generate_weekly_report(week_offset)
+    report = generate_weekly_report(week_offset, account=account)
 
     report["generated_at"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     return report
@@ -365,18 +570,49 @@ def index():
     if week_offset > 0:
         week_offset = 0
 
-    report = generate_weekly_report_full(week_offset)
+    data = request_account()
+    report = get_full_report_cached(week_offset, data.key)
 
     return render_template(
         "index.html",
         report=report,
-        week_offset=week_offset
+        week_offset=week_offset,
+        account=data.key,
+        accounts=account_list()
     )
 
 
 @app.route("/api/report")
+@conditional
 def api_report():
-    return jsonify(get_report_cached())
+    return jsonify(get_report_cached(request_account().key))
+
+@app.route("/api/stream")
+def api_stream():
+    """
+    /api/stream?account=<uin>  SSE
+        series   本周序列的增量（LIVE_BUCKET 秒一格）和最新总览
+        records  新增的访客记录（仅管理员）
+    """
+    data = request_account()
+    sub = LIVE_FEEDS[data.key].subscribe(admin=bool(session.get("is_admin")))
+    if sub is None:
+        abort(503, "实时连接数已满")
+
+    start_ts, _ = week_range(0)
+    hello = {"account": data.key, "version": data.store.version, "start": start_ts}
+    return Response(
+        LIVE_FEEDS[data.key].stream(sub, hello),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/api/accounts")
+def api_accounts():
+    return jsonify({
+        "default": DEFAULT_ACCOUNT,
+        "accounts": account_list()
+    })
 
 
 # ---------- HTML ----------
@@ -392,22 +628,29 @@ def render_html(report):
 
 # ================= QoS 限流器 =================
 
-# ip -> deque[timestamps]
-IP_BUCKET = defaultdict(deque)
+def make_limiter(limit, window):
+    return rateLimit.TokenBucketLimiter(
+        limit,
+        window,
+        max_entries=QOS_CONF.get("max_ips", 100000),
+        idle_seconds=QOS_CONF.get("idle_seconds", 300),
+    )
 
-def qos_check(ip):
-    now = time.time()
-    bucket = IP_BUCKET[ip]
+#全局：每个 IP 每 QOS_WINDOW 秒 QOS_LIMIT 次（令牌桶，允许同等突发）
+QOS_LIMITER = make_limiter(QOS_LIMIT, QOS_WINDOW)
 
-    # 清理过期请求
-    while bucket and now - bucket[0] > QOS_WINDOW:
-        bucket.popleft()
+#按路由额外限流（如计算量大的 /api/report/custom）
+ROUTE_LIMITERS = {
+    path: make_limiter(conf["limit"], conf.get("window", 1))
+    for path, conf in QOS_CONF.get("routes", {}).items()
+}
 
-    if len(bucket) >= QOS_LIMIT:
+def qos_check(ip, path=None):
+    now = time.monotonic()
+    if not QOS_LIMITER.allow(ip, now):
         return False
-
-    bucket.append(now)
-    return True
+    route = ROUTE_LIMITERS.get(path)
+    return route is None or route.allow(ip, now)
 
 
 # ================= IP 获取 =================
@@ -422,59 +665,179 @@ def get_client_ip():
 
 # ================= 访问日志 =================
 
+#后台线程批量写盘并按大小/时间轮转，请求线程只入队
+ACCESS_LOG = accessLog.AccessLogWriter(
+    LOG_FILE,
+    max_queue=ACCESS_LOG_CONF.get("max_queue", 10000),
+    batch=ACCESS_LOG_CONF.get("batch", 500),
+    flush_interval=ACCESS_LOG_CONF.get("flush_interval", 1),
+    max_bytes=int(ACCESS_LOG_CONF.get("max_mb", 10) * 1024 * 1024),
+    rotate_seconds=int(ACCESS_LOG_CONF.get("rotate_hours", 24) * 3600),
+    backups=ACCESS_LOG_CONF.get("backups", 14),
+).start()
+
 def write_access_log(record):
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    ACCESS_LOG.write(record)
 
 
 ADMIN_IPS = {"127.0.0.1", "192.168.2.64"}
 
 @app.before_request
 def before_request():
+    g.request_start = time.perf_counter()
     ip = get_client_ip()
 
+    # 管理员对单个请求采样：/xxx?profile=1 返回 collapsed 调用栈而不是原响应
+    if PROFILE_ENABLED and request.args.get("profile") == "1" and session.get("is_admin"):
+        g.sampler = sampler.StackSampler(threading.get_ident(), PROFILE_INTERVAL).start()
+
     # 管理员接口不限流
     if request.path.startswith("/admin"):
         pass
     else:
-        if not qos_check(ip):
+        if not qos_check(ip, request.path):
             abort(429, description="想刷我接口吗😅")
 
-    # ---- 记录日志 ----
+
+@app.after_request
+def after_request(response):
+    # ---- 记录日志（带状态码和耗时，限流拒绝的请求也会记录） ----
     record = {
         "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "timestamp": int(time.time()),
-        "ip": ip,
+        "ip": get_client_ip(),
         "port": request.environ.get("REMOTE_PORT"),
         "method": request.method,
-        "path": request.path
+        "path": request.path,
+        "status": response.status_code,
+        "bytes": response.content_length,
     }
+    if "request_start" in g:
+        elapsed = time.perf_counter() - g.request_start
+        record["ms"] = round(elapsed * 1000, 2)
+        # 按路由模板统计（/admin/api/uin/<uin>），不让路径参数撑大标签数
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        METRICS.observe("qzone_http_request_seconds", elapsed, route=route, method=request.method)
+        METRICS.inc("qzone_http_requests_total", route=route, status=response.status_code)
     write_access_log(record)
+    return response
+
+
+# ---- 压缩（Flask 倒序执行 after_request，这个先于日志执行，日志里是压缩后的字节数） ----
+@app.after_request
+def compress_response(response):
+    return httpCompress.compress_response(
+        response,
+        request.headers.get("Accept-Encoding"),
+        min_size=HTTP_CONF.get("compress_min_bytes", 1024),
+        level=HTTP_CONF.get("compress_level", 6),
+    )
+
+
+# ---- 采样结果（最先执行的 after_request，采样尽量只覆盖视图本身） ----
+@app.after_request
+def profile_response(response):
+    if "sampler" not in g or response.is_streamed:
+        return response
+    s = g.pop("sampler").stop()
+    return Response(
+        s.collapsed(),
+        mimetype="text/plain",
+        headers={
+            "X-Profile-Samples": str(s.samples),
+            "X-Profile-Seconds": f"{s.elapsed:.4f}",
+            "X-Original-Status": str(response.status_code),
+        },
+    )
+
+@app.teardown_request
+def stop_sampler(exc):
+    # 视图抛异常或流式响应时 profile_response 不会停掉采样线程
+    s = g.pop("sampler", None)
+    if s is not None:
+        s.stop()
 
 
 @app.route("/admin/api/top10")
 @admin_required
+@conditional
 def admin_week_top10():
     return jsonify({
-        "week": get_report_cached()["week"],
-        "top10": get_week_top10_users()
+        "week": week_label(week_start_6am()),
+        "top10": get_week_top10_users(request_account().key)
+    })
+
+@app.route("/admin/api/top")
+@admin_required
+@conditional
+def admin_top_users():
+    """
+    /admin/api/top?start=<ts>&end=<ts>&k=10&mode=exact|approx
+    不传 start/end 时为本周
+    """
+    data = request_account()
+    week_start_ts, week_end_ts = week_range(0)
+    try:
+        start_ts = int(request.args.get("start", week_start_ts))
+        end_ts = int(request.args.get("end", week_end_ts))
+    except ValueError:
+        abort(400, "参数错误")
+    try:
+        k = int(request.args.get("k", 10))
+    except ValueError:
+        k = 0
+    if not 1 <= k <= REPORT_MAX_TOP_K:
+        return limit_error("k", f"k 需为 1 ~ {REPORT_MAX_TOP_K} 的整数")
+
+    mode = request.args.get("mode", "exact")
+    if mode not in ("exact", "approx"):
+        abort(400, "mode 只能是 exact 或 approx")
+    if mode == "approx" and not data.daily.aligned(start_ts, end_ts):
+        abort(400, "近似模式需要按天（6:00）对齐的区间")
+
+    return jsonify({
+        "start": start_ts,
+        "end": end_ts,
+        "k": k,
+        "mode": mode,
+        "top": get_top_users(start_ts, end_ts, k, approx=(mode == "approx"), account=data.key)
     })
 
 @app.route("/admin/api/unique_total")
 @admin_required
+@conditional
 def admin_unique_users():
     return jsonify({
-        "unique_users_total": get_total_unique_users()
+        "unique_users_total": get_total_unique_users(request_account().key)
     })
 
 @app.route("/admin/api/uin/<uin>")
 @admin_required
+@conditional
 def admin_query_uin(uin):
-    limit = int(request.args.get("limit", 200))
+    """
+    /admin/api/uin/<uin>?limit=200&before=<ts>
+    before 为上一页最后一条的时间，返回 next_before 供翻页
+    """
+    data = request_account()
+    try:
+        limit = int(request.args.get("limit", 200))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= REPORT_MAX_UIN_RECORDS:
+        return limit_error("limit", f"limit 需为 1 ~ {REPORT_MAX_UIN_RECORDS} 的整数")
+    try:
+        before = request.args.get("before")
+        before = int(before) if before else None
+    except ValueError:
+        abort(400, "参数错误")
+
+    records = query_uin_records(uin, limit, before, data.key)
     return jsonify({
         "uin": uin,
-        "count": len(query_uin_records(uin, limit)),
-        "records": query_uin_records(uin, limit)
+        "count": data.store.count_uin(uin),
+        "records": records,
+        "next_before": records[-1]["time"] if len(records) == limit else None
     })
 
 @app.route("/admin/login", methods=["GET", "POST"])
@@ -491,40 +854,176 @@ def admin_login():
 @app.route("/admin")
 @admin_required
 def admin_dashboard():
-    return render_template("admin_dashboard.html")
+    return render_template("admin_dashboard.html", accounts=account_list())
 
 
 @app.route("/admin/api/restart", methods=["POST"])
 @admin_required
 def admin_restart():
+    if not RESTART_ENABLED:
+        return jsonify({
+            "status": "error",
+            "message": "分进程模式下请分别重启采集进程和 Web 服务"
+        }), 409
     threading.Thread(target=restart_self).start()
     return jsonify({
         "status": "ok",
         "message": "服务正在重启"
     })
 
+@app.route("/admin/api/export", methods=["POST"])
+@admin_required
+def admin_export():
+    data = request_account()
+    trigger = EXPORT_TRIGGERS.get(data.key)
+    if trigger is None:
+        # 采集端在另一个进程：留下请求文件，由采集端下次轮询时导出
+        data.request_export()
+        return jsonify({
+            "status": "ok",
+            "message": f"已通知采集端导出 Excel（{data.nickname}）"
+        }), 202
+
+    trigger()
+    return jsonify({
+        "status": "ok",
+        "message": f"已触发 Excel 导出（{data.nickname}）"
+    })
+
+@app.route("/admin/api/access_stats")
+@admin_required
+def admin_access_stats():
+    """/admin/api/access_stats?window=300 最近 window 秒的访问统计"""
+    try:
+        window = min(max(int(request.args.get("window", 300)), 1), 86400)
+    except ValueError:
+        abort(400, "参数错误")
+    stats = ACCESS_LOG.stats(window)
+    stats["qos"] = {
+        "global": QOS_LIMITER.stats(),
+        "routes": {path: lim.stats() for path, lim in ROUTE_LIMITERS.items()},
+    }
+    return jsonify(stats)
+
+@app.route("/admin/api/scheduler")
+@admin_required
+def admin_scheduler():
+    # 同进程直接取，分进程部署时读采集端写出的状态文件
+    accounts = {}
+    for key, data in open_accounts().items():
+        fn = COLLECTOR_STATUS.get(key)
+        status = fn() if fn else data.read_status()
+        if status:
+            status.pop("metrics", None)  # 状态文件里的指标给 /admin/api/metrics 用
+            accounts[key] = status
+
+    if not accounts:
+        return jsonify({
+            "status": "error",
+            "message": "采集端未运行"
+        }), 503
+
+    return jsonify({
+        "accounts": accounts
+    })
+
+@app.route("/admin/api/metrics")
+@admin_required
+def admin_metrics():
+    """Prometheus 文本格式；数据规模、缓存、实时连接等在抓取时读取"""
+    series = METRICS.snapshot()
+
+    for key, data in open_accounts().items():
+        cache = data.cache.stats()
+        segments = data.log.segments()
+        series += [
+            metrics.sample("qzone_db_records", "gauge", "记录条数", len(data.store), account=key),
+            metrics.sample("qzone_db_unique_visitors", "gauge", "累计独立访客", data.store.unique_total(), account=key),
+            metrics.sample("qzone_db_log_bytes", "gauge", "分段日志总大小", sum(_file_size(p) for p in segments), account=key),
+            metrics.sample("qzone_db_log_segments", "gauge", "分段日志文件数", len(segments), account=key),
+            metrics.sample("qzone_db_newest_timestamp_seconds", "gauge", "最新一条记录的时间", data.store.newest_ts, account=key),
+            metrics.sample("qzone_db_load_seconds", "gauge", "启动时载入数据和索引的耗时", data.load_seconds, account=key),
+            metrics.sample("qzone_report_cache_hits_total", "counter", "报表缓存命中", cache["hits"], account=key),
+            metrics.sample("qzone_report_cache_misses_total", "counter", "报表缓存未命中", cache["misses"], account=key),
+            metrics.sample("qzone_report_cache_entries", "gauge", "报表缓存条目", cache["entries"], account=key),
+            metrics.sample("qzone_live_clients", "gauge", "实时推送连接数", len(LIVE_FEEDS[key]), account=key),
+        ]
+        # 分进程部署：采集端的指标在它写出的状态文件里
+        if key not in COLLECTOR_STATUS:
+            status = data.read_status() or {}
+            series += status.get("metrics", [])
+
+    access = ACCESS_LOG.stats(60, top=0)
+    series += [
+        metrics.sample("qzone_access_log_queue", "gauge", "访问日志待写条数", access["queue"]),
+        metrics.sample("qzone_access_log_dropped_total", "counter", "队列满丢弃的访问日志", access["dropped"]),
+        metrics.sample("qzone_qos_rejected_total", "counter", "限流拒绝次数", QOS_LIMITER.stats()["rejected"]),
+        metrics.sample("qzone_qos_entries", "gauge", "限流表条目数", len(QOS_LIMITER)),
+    ]
+    return Response(metrics.render(series), mimetype="text/plain; version=0.0.4")
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
 @app.route("/api/report/custom")
+@conditional
 def api_report_custom():
     """
     /api/report/custom?
         start=1706000000
         &end=1706600000
         &scale=3600
+        &max_points=2000（可选，桶数超过时降采样，上限 REPORT_MAX_POINTS）
+        &mode=sum|lttb（可选，降采样方式）
+        &account=<uin>（可选）
     """
     try:
         start_ts = int(request.args["start"])
         end_ts = int(request.args["end"])
         scale = int(request.args.get("scale", 3600))
+        max_points = int(request.args.get("max_points", REPORT_MAX_POINTS))
     except Exception:
         abort(400, "参数错误")
 
-    report = generate_weekly_report(
-        start_ts=start_ts,
-        end_ts=end_ts,
-        bucket_seconds=scale
+    mode = request.args.get("mode", "sum")
+    if mode not in ("sum", "lttb"):
+        abort(400, "mode 只能是 sum 或 lttb")
+
+    # ---- 上限检查：先按参数算出规模，超限直接拒绝，不做任何统计 ----
+    if scale < 1:
+        return limit_error("scale", "scale 必须是正整数（秒）")
+    if not 3 <= max_points <= REPORT_MAX_POINTS:
+        return limit_error("max_points", f"max_points 需在 3 ~ {REPORT_MAX_POINTS} 之间")
+
+    span = end_ts - start_ts
+    if span > REPORT_MAX_RANGE_DAYS * 86400:
+        return limit_error(
+            "max_range_days",
+            f"时间范围 {span / 86400:.1f} 天超过上限 {REPORT_MAX_RANGE_DAYS} 天"
+        )
+
+    n_raw = max(span // scale, 0)
+    if mode == "lttb" and n_raw > REPORT_MAX_BUCKETS:
+        return limit_error(
+            "max_buckets",
+            f"lttb 需要先统计全部 {n_raw} 个原始桶，超过上限 {REPORT_MAX_BUCKETS}；请增大 scale 或改用 mode=sum"
+        )
+
+    report = get_custom_report_cached(
+        start_ts, end_ts, scale, request_account().key, max_points=max_points, mode=mode
     )
     return jsonify(report)
 
+def limit_error(limit, message):
+    return jsonify({
+        "status": "error",
+        "limit": limit,
+        "message": message
+    }), 400
+
 def run_background():
     """
     在后台线程启动 Flask，不阻塞调用方
@@ -545,6 +1044,8 @@ def run_background():
     return t
 
 if __name__ == "__main__":
+    # 单独运行时没有采集端写内存，只读打开并跟进采集端的写入
+    start_watchers()
     host = CONFIG["server"].get("host", "0.0.0.0")
     app.run(host=host, port=PORT, debug=False)
 
@@ -0,0 +1,27 @@
+"""
+生产部署：采集端与 Web 分进程
+
+    python app.py --collector-only                       # 采集进程（唯一写入者）
+    gunicorn -w 4 -b 0.0.0.0:8890 wsgi:application       # Linux，多进程 Web
+    waitress-serve --port=8890 --threads=8 wsgi:application   # Windows
+
+config.json 中 server.mode 设为 "split" 时 app.py 默认就只采集。
+每个 Web 进程只读打开各账号的数据，监视采集端写出的 <db>.notify 增量载入新记录；
+派生索引文件只由采集端保存。gunicorn 不要加 --preload（监视线程不会带进 fork 出的 worker）。
+
+/api/stream 是长连接（SSE），每个连接占一个线程，gunicorn 需用线程 worker：
+    gunicorn -w 4 --worker-class gthread --threads 16 -b 0.0.0.0:8890 wsgi:application
+"""
+
+import weeklyReport
+
+# 多个 worker 各写各的访问日志（<log>.w0、<log>.w1 ...），避免轮转时互相覆盖；
+# 编号用文件锁分配，重启的 worker 沿用空出的编号，旧文件照常轮转和清理
+weeklyReport.ACCESS_LOG.use_worker_slot()
+# worker 里 sys.argv 是服务器的命令行，/admin/api/restart 不可用
+weeklyReport.RESTART_ENABLED = False
+
+weeklyReport.open_accounts(readonly=True)
+weeklyReport.start_watchers()
+
+application = weeklyReport.app